@@ -17,50 +17,77 @@ from . import images
 class Application(tk.Tk):
   """Application root window"""
 
+  # number of records fetched per page by the record list
+  page_size = 200
+  # ms to wait for more settings changes before saving them
+  settings_save_delay = 500
 
   def __init__(self, *args, **kwargs):
-    super().__init__(*args, **kwargs)
+    # Time each phase of startup; see _finish_startup()
+    tracer = m.StartupTracer()
+    with tracer.phase('create root window'):
+      super().__init__(*args, **kwargs)
+    self.startup_tracer = tracer
 
     # move here for ch12 because we need some settings data to authenticate
-    self.settings_model = m.SettingsModel()
-    self._load_settings()
+    with tracer.phase('load settings'):
+      self.settings_model = m.SettingsModel()
+      self._load_settings()
 
     # Hide window while GUI is built
     self.withdraw()
 
     # Authenticate
+    # the login dialog is built once and reused for every login
+    self._login_dialog = None
     if not self._show_login():
       self.destroy()
       return
 
-    # show the window
-    # chapter14:  use after() here to eliminate the small window
-    # that flashes up breifly
-    self.after(250, self.deiconify)
-
    # Create model
    # remove for ch12
    # self.model = m.CSVModel()
 
-    self.inserted_rows = []
-    self.updated_rows = []
+    # rows saved this session, shared with the record list
+    self.changes = m.ChangeTracker()
+    # records are saved by a background thread, created on first use
+    self._saver = None
+    self._save_results = Queue()
+    self._saves_outstanding = 0
+    # records whose save failed, by display key, until reopened
+    self.failed_saves = dict()
+
+    # popup windows are hidden on close and reused
+    self._chart_windows = dict()
+    # chart data, cached by name with the model's data version
+    self._chart_cache = dict()
+    self._chart_loads = dict()
+    self._record_window = None
 
     # Begin building GUI
+    # The window is shown as soon as the forms are built;
+    # the menu and record list are filled in afterwards.
+    with tracer.phase('build main window'):
+      self._build_main_window()
+
+    # show the window
+    # chapter14:  withdraw()/deiconify() eliminates the small window
+    # that flashes up breifly
+    self.update_idletasks()
+    self.deiconify()
+    self.after_idle(self._finish_startup)
+
+  def _build_main_window(self):
+    """Build the parts of the window needed before it is shown"""
     self.title("ABQ Data Entry Application")
     self.columnconfigure(0, weight=1)
 
     # Set taskbar icon
-    self.taskbar_icon = tk.PhotoImage(file=images.ABQ_LOGO_64)
+    self.taskbar_icon = images.get_image(self, images.ABQ_LOGO_64)
     self.call('wm', 'iconphoto', self._w, self.taskbar_icon)
 
-    # Create the menu
-    #menu = MainMenu(self, self.settings)
-    menu_class = get_main_menu_for_os(platform.system())
-    menu = menu_class(self, self.settings)
-
-    self.config(menu=menu)
     event_callbacks = {
-      '<<FileQuit>>': lambda _: self.quit(),
+      '<<FileQuit>>': self._on_quit,
       '<<ShowRecordlist>>': self._show_recordlist,
       '<<NewRecord>>': self._new_record,
       '<<UpdateWeatherData>>': self._update_weather_data,
@@ -73,7 +100,7 @@ class Application(tk.Tk):
       self.bind(sequence, callback)
 
     # new for ch9
-    self.logo = tk.PhotoImage(file=images.ABQ_LOGO_32)
+    self.logo = images.get_image(self, images.ABQ_LOGO_32)
     ttk.Label(
       self,
       text="ABQ Data Entry Application",
@@ -88,7 +115,7 @@ class Application(tk.Tk):
     self.notebook.grid(row=1, padx=10, sticky='NSEW')
 
     # The data record form
-    self.recordform_icon = tk.PhotoImage(file=images.FORM_ICON)
+    self.recordform_icon = images.get_image(self, images.FORM_ICON)
     self.recordform = v.DataRecordForm(self, self.model, self.settings)
     self.notebook.add(
         self.recordform, text='Entry Form',
@@ -96,17 +123,36 @@ class Application(tk.Tk):
     )
     self.recordform.bind('<<SaveRecord>>', self._on_save)
 
+    # The lab sheet, for entering a whole lab check at once.
+    # Only its tab is added here; the sheet is built the first
+    # time the tab is selected.
+    self.labsheet = None
+    self._labsheet_tab = ttk.Frame(self)
+    self.notebook.add(self._labsheet_tab, text='Lab Sheet')
+    self.notebook.bind('<<NotebookTabChanged>>', self._on_tab_changed)
+
 
-    # The data record list
-    self.recordlist_icon = tk.PhotoImage(file=images.LIST_ICON)
-    self.recordlist = v.RecordList(self)
+    # The data record list, populated by _finish_startup()
+    self.recordlist_icon = images.get_image(self, images.LIST_ICON)
+    self.recordlist = v.RecordList(self, self.changes)
 
     self.notebook.insert(
         0, self.recordlist, text='Records',
         image=self.recordlist_icon, compound=tk.LEFT
     )
-    self._populate_recordlist()
+    # Records are loaded a page at a time, newest first.
+    # Until the last page is in, the record list passes its
+    # filters back to us so we can query the database.
+    self.record_filters = dict()
+    self.record_search = ''
+    self.records_loaded = 0
+    self._page_generation = 0
     self.recordlist.bind('<<OpenRecord>>', self._open_record)
+    self.recordlist.bind(
+      '<<OpenRecordInWindow>>', self._open_record_window)
+    self.recordlist.bind('<<FilterRecords>>', self._filter_recordlist)
+    self.recordlist.bind('<<LoadMoreRecords>>', self._load_more_records)
+    self.recordlist.bind('<<SearchRecords>>', self._search_recordlist)
 
 
     self._show_recordlist()
@@ -119,42 +165,182 @@ class Application(tk.Tk):
 
     self.records_saved = 0
 
+  def _finish_startup(self):
+    """Build the menu and load the records once the window is up"""
+    tracer = self.startup_tracer
+    with tracer.phase('build menu'):
+      #menu = MainMenu(self, self.settings)
+      menu_class = get_main_menu_for_os(platform.system())
+      menu = menu_class(self, self.settings)
+      self.config(menu=menu)
+    with tracer.phase('load records'):
+      self._populate_recordlist()
+    # the log goes beside the settings file
+    tracer.write(
+      self.settings_model.filepath.with_name('abq_startup.log')
+    )
 
-  def _on_save(self, *_):
+  def _on_tab_changed(self, *_):
+    """Build the lab sheet when its tab is first selected"""
+    if self.labsheet is not None:
+      return
+    if self.notebook.select() != str(self._labsheet_tab):
+      return
+    self.labsheet = v.LabSheetView(
+      self._labsheet_tab, self.model, self.settings,
+      self.recordform.autofill
+    )
+    self.labsheet.pack(fill=tk.BOTH, expand=True)
+    self.labsheet.bind('<<SaveLabSheet>>', self._on_save_sheet)
+
+  def _on_save(self, event=None):
     """Handles file-save requests"""
+    # either the main record form or the one in the record window
+    form = event.widget if event else self.recordform
 
     # Check for errors first
 
-    errors = self.recordform.get_errors()
+    errors = form.get_errors()
     if errors:
+      self._show_field_errors(errors)
+      return False
+
+    # Save optimistically: the record is committed in the
+    # background while the technician moves on to the next one.
+    data = form.get()
+    rowkey = form.current_record
+    if self._saver is None:
+      self._saver = m.ThreadedSaver(self.model, self._save_results)
+      self._saver.start()
+    # the form goes with the job, so a failed save returns to it
+    self._saver.save(data, rowkey, form)
+    self._saves_outstanding += 1
+    self.changes.add_pending(self._display_key(data))
+    self.status.set('Saving record…')
+    form.reset()
+    self.recordlist.refresh()
+    if self._saves_outstanding == 1:
+      self._check_save_results()
+
+  @staticmethod
+  def _display_key(data):
+    return (data['Date'], data['Time'], data['Lab'], data['Plot'])
+
+  def _check_save_results(self):
+    """Process the outcome of background saves"""
+    while not self._save_results.empty():
+      item = self._save_results.get()
+      self._saves_outstanding -= 1
+      data, rowkey, error, form = item.body
+      self.changes.resolve_pending(self._display_key(data))
+      if error is not None:
+        self._save_failed(form, data, rowkey, error)
+        continue
+      # the lab check and plot check may have changed
+      self.recordform.autofill.record_saved(data)
+      if rowkey is not None:
+        self.changes.add_updated(self._display_key(data))
+      else:
+        self.changes.add_inserted(self._display_key(data))
+      self.records_saved += 1
       self.status.set(
-        "Cannot save, error in fields: {}"
-        .format(', '.join(errors.keys()))
+        "{} records saved this session".format(self.records_saved)
       )
-      message = "Cannot save record"
-      detail = "The following fields have errors: \n  * {}".format(
-        '\n  * '.join(errors.keys())
+    if self._saves_outstanding:
+      self.after(100, self._check_save_results)
+    else:
+      # reload once the queue of saves has drained
+      self._populate_recordlist()
+
+  def _save_failed(self, form, data, rowkey, error):
+    """Give a record which failed to save back to the user
+
+    If the form it came from hasn't been touched since, the record
+    goes back into it.  Otherwise the technician has moved on, so
+    it is listed in the record list to be reopened from there.
+    """
+    if form.winfo_exists() and not form.has_changes():
+      form.restore(rowkey, data, error)
+      if form is self.recordform:
+        self.notebook.select(form)
+      else:
+        # the form in the record window
+        form.master.show()
+      self.status.set('Record was not saved')
+    else:
+      key = self._display_key(data)
+      self.failed_saves[tuple(str(v) for v in key)] = (rowkey, data, error)
+      self.changes.add_failed(key)
+      self.recordlist.refresh()
+      self.status.set(
+        'Record for Lab {}, Plot {} was not saved; '
+        'open it from the record list to try again'.format(*key[2:])
       )
+    messagebox.showerror(
+      title='Error',
+      message='Problem saving record',
+      detail=str(error)
+    )
+
+  def _reopen_failed_save(self, form):
+    """Put the selected record back into form if its save failed
+
+    Returns False if the selected record isn't a failed save.
+    """
+    key = self.recordlist.selected_id
+    if key not in self.failed_saves:
+      return False
+    rowkey, data, error = self.failed_saves.pop(key)
+    self.changes.resolve_failed(key)
+    form.restore(rowkey, data, error)
+    self.recordlist.refresh()
+    return True
+
+  def _show_field_errors(self, errors, message="Cannot save record"):
+    """Report field errors which prevent saving"""
+    self.status.set(
+      "Cannot save, error in fields: {}"
+      .format(', '.join(errors.keys()))
+    )
+    detail = "The following fields have errors: \n  * {}".format(
+      '\n  * '.join(errors.keys())
+    )
+    messagebox.showerror(
+      title='Error',
+      message=message,
+      detail=detail
+    )
+
+  def _on_save_sheet(self, *_):
+    """Save every entered plot of the lab sheet in one transaction"""
+    errors = self.labsheet.get_errors()
+    if errors:
+      self._show_field_errors(errors, "Cannot save lab sheet")
+      return False
+
+    records = self.labsheet.get()
+    if not records:
+      self.status.set('No plots have been entered on the lab sheet')
+      return False
+    try:
+      self.model.save_records(records)
+    except Exception as e:
       messagebox.showerror(
         title='Error',
-        message=message,
-        detail=detail
+        message='Problem saving lab sheet',
+        detail=str(e)
       )
       return False
-
-    data = self.recordform.get()
-    rowkey = self.recordform.current_record
-    self.model.save_record(data, rowkey)
-    if rowkey is not None:
-      self.updated_rows.append(rowkey)
-    else:
-      rowkey = (data['Date'], data['Time'], data['Lab'], data['Plot'])
-      self.inserted_rows.append(rowkey)
-    self.records_saved += 1
+    for record in records:
+      self.changes.add_inserted(
+        (record['Date'], record['Time'], record['Lab'], record['Plot'])
+      )
+      self.recordform.autofill.record_saved(record)
+    self.records_saved += len(records)
     self.status.set(
       "{} records saved this session".format(self.records_saved)
     )
-    self.recordform.reset()
+    self.labsheet.reset()
     self._populate_recordlist()
 
 # Remove for ch12
@@ -168,8 +354,7 @@ class Application(tk.Tk):
 #    )
 #    if filename:
 #      self.model = m.CSVModel(filename=filename)
-#      self.inserted_rows.clear()
-#      self.updated_rows.clear()
+#      self.changes.clear()
 #      self._populate_recordlist()
 
   @staticmethod
@@ -190,16 +375,27 @@ class Application(tk.Tk):
       return False
     return True
 
+  def _ask_login(self, title, error='', username=''):
+    """Show the login dialog and return (username, password) or None"""
+    if self._login_dialog is None:
+      self._login_dialog = v.LoginDialog(self)
+    return self._login_dialog.show(title, error, username)
+
   def _show_login(self):
     """Show login dialog and attempt to login"""
     error = ''
+    username = ''
     title = "Login to ABQ Data Entry"
+    tracer = self.startup_tracer
     while True:
-      login = v.LoginDialog(self, title, error)
-      if not login.result:  # User canceled
+      with tracer.phase('login dialog (waiting for user)'):
+        result = self._ask_login(title, error, username)
+      if not result:  # User canceled
         return False
-      username, password = login.result
-      if self._database_login(username, password):
+      username, password = result
+      with tracer.phase('connect to database'):
+        logged_in = self._database_login(username, password)
+      if logged_in:
         return True
       error = 'Login Failed' # loop and redisplay
 
@@ -214,6 +410,7 @@ class Application(tk.Tk):
     }
 
     # create our dict of settings variables from the model's settings.
+    self._settings_save_id = None
     self.settings = dict()
     for key, data in self.settings_model.fields.items():
       vartype = vartypes.get(data['type'], tk.StringVar)
@@ -235,27 +432,125 @@ class Application(tk.Tk):
       style.theme_use(theme)
 
   def _save_settings(self, *_):
-    """Save the current settings to a preferences file"""
+    """Save the settings shortly, so a burst of changes is written once"""
+    if self._settings_save_id is None:
+      self._settings_save_id = self.after(
+        self.settings_save_delay, self._write_settings
+      )
 
+  def _write_settings(self, background=True):
+    """Save the current settings to a preferences file"""
+    self._settings_save_id = None
     for key, variable in self.settings.items():
       self.settings_model.set(key, variable.get())
-    self.settings_model.save()
+    if background:
+      self.settings_model.save_in_background()
+    else:
+      self.settings_model.save()
+
+  def _flush_settings(self):
+    """Write any settings change still waiting to be saved"""
+    if getattr(self, '_settings_save_id', None):
+      self.after_cancel(self._settings_save_id)
+      self._write_settings(background=False)
+
+  def _on_quit(self, *_):
+    self._flush_settings()
+    self.quit()
+
+  def destroy(self):
+    self._flush_settings()
+    super().destroy()
 
   def _show_recordlist(self, *_):
     """Show the recordform"""
     self.notebook.select(self.recordlist)
 
   def _populate_recordlist(self):
+    """Reload the records, keeping as many pages as are loaded"""
+    # any page still being fetched is now out of date
+    self._page_generation += 1
+    if self.record_search:
+      self._populate_search_results()
+      return
+    limit = max(self.page_size, self.records_loaded)
     try:
-      rows = self.model.get_all_records()
+      rows = self.model.get_records_page(
+        limit=limit, **self.record_filters
+      )
     except Exception as e:
+      # don't page on from a list which failed to reload
+      self.recordlist.complete = True
       messagebox.showerror(
         title='Error',
         message='Problem reading file',
         detail=str(e)
       )
     else:
-      self.recordlist.populate(rows)
+      self.records_loaded = len(rows)
+      self.recordlist.complete = len(rows) < limit
+      self.recordlist.populate(rows, self.record_filters)
+    finally:
+      self.recordlist.loading = False
+
+  def _filter_recordlist(self, *_):
+    """Reload the record list using its filters"""
+    self.record_filters = self.recordlist.filters
+    self.records_loaded = 0
+    self._populate_recordlist()
+
+  def _search_recordlist(self, *_):
+    """Search the records using the record list's search text"""
+    self.record_search = self.recordlist.search_text
+    if not self.record_search:
+      self.recordlist.end_search()
+      self.records_loaded = 0
+    self._populate_recordlist()
+
+  def _populate_search_results(self):
+    try:
+      rows = self.model.search_records(self.record_search)
+    except Exception as e:
+      messagebox.showerror(
+        title='Error',
+        message='Problem searching records',
+        detail=str(e)
+      )
+    else:
+      self.recordlist.show_search_results(rows)
+      self.status.set(
+        f'{len(rows)} records match "{self.record_search}"'
+      )
+
+  def _load_more_records(self, *_):
+    """Fetch the next page of records in the background"""
+    last = self.recordlist.index.records[-1:]
+    after = tuple(
+      str(last[0][key]) for key in ('Date', 'Time', 'Lab', 'Plot')
+    ) if last else None
+    queue = Queue()
+    m.BackgroundCall(
+      queue, self.model.get_records_page,
+      after=after, limit=self.page_size, **self.record_filters
+    ).start()
+    self._check_page_queue(queue, self._page_generation)
+
+  def _check_page_queue(self, queue, generation):
+    if queue.empty():
+      self.after(50, self._check_page_queue, queue, generation)
+      return
+    item = queue.get()
+    self.recordlist.loading = False
+    if generation != self._page_generation:
+      # the list was reloaded while this page was fetched
+      return
+    if item.status == 'error':
+      self.status.set(f'Problem loading records: {item.body}')
+      return
+    rows = item.body
+    self.records_loaded += len(rows)
+    self.recordlist.complete = len(rows) < self.page_size
+    self.recordlist.append(rows)
 
   def _new_record(self, *_):
     """Open the record form with a blank record"""
@@ -263,8 +558,8 @@ class Application(tk.Tk):
     self.notebook.select(self.recordform)
 
 
-  def _open_record(self, *_):
-    """Open the Record selected recordlist id in the recordform"""
+  def _get_selected_record(self):
+    """Return the rowkey and record selected in the recordlist"""
     rowkey = self.recordlist.selected_id
     try:
       record = self.model.get_record(rowkey)
@@ -272,10 +567,39 @@ class Application(tk.Tk):
       messagebox.showerror(
         title='Error', message='Problem reading file', detail=str(e)
       )
-      return
-    self.recordform.load_record(rowkey, record)
+      return None, None
+    return rowkey, record
+
+  def _open_record(self, *_):
+    """Open the Record selected recordlist id in the recordform"""
+    if not self._reopen_failed_save(self.recordform):
+      rowkey, record = self._get_selected_record()
+      if record is None:
+        return
+      self.recordform.load_record(rowkey, record)
     self.notebook.select(self.recordform)
 
+  def _open_record_window(self, *_):
+    """Open the selected record in a second form, for side-by-side editing"""
+    if self.recordlist.selected_id in self.failed_saves:
+      rowkey, record = None, None
+    else:
+      rowkey, record = self._get_selected_record()
+      if record is None:
+        return
+    if self._record_window is None:
+      self._record_window = v.PopupWindow(self, 'ABQ Record')
+      form = v.DataRecordForm(
+        self._record_window, self.model, self.settings
+      )
+      form.pack(fill='both', expand=True)
+      form.bind('<<SaveRecord>>', self._on_save)
+      self._record_window.form = form
+    form = self._record_window.form
+    if not self._reopen_failed_save(form):
+      form.load_record(rowkey, record)
+    self._record_window.show()
+
   # new chapter 9
   def _set_font(self, *_):
     """Set the application's font"""
@@ -328,10 +652,10 @@ class Application(tk.Tk):
       return
 
     # authenticate
-    d = v.LoginDialog(self, 'Login to ABQ Corporate SFTP')
-    if d.result is None:
+    result = self._ask_login('Login to ABQ Corporate SFTP')
+    if result is None:
       return
-    username, password = d.result
+    username, password = result
 
     # create model
     host = self.settings['abq_sftp_host'].get()
@@ -405,11 +729,9 @@ class Application(tk.Tk):
       return
 
     # Authenticate to the rest server
-    d = v.LoginDialog(
-      self, 'Login to ABQ Corporate REST API'
-    )
-    if d.result is not None:
-      username, password = d.result
+    result = self._ask_login('Login to ABQ Corporate REST API')
+    if result is not None:
+      username, password = result
     else:
       return
 
@@ -488,31 +810,92 @@ class Application(tk.Tk):
     self.after(100, self._check_queue, queue)
 
   #New for ch15
+  def _show_chart_window(self, name, title, build):
+    """Show the chart window called name and return its chart
+
+    The window is built by build(popup) the first time, and
+    hidden rather than destroyed when it is closed.
+    """
+    if name not in self._chart_windows:
+      popup = v.PopupWindow(self, title)
+      chart = build(popup)
+      chart.pack(fill='both', expand=True)
+      self._chart_windows[name] = (popup, chart)
+    popup, chart = self._chart_windows[name]
+    popup.show()
+    return chart
+
+  def _load_chart(self, name, fetch, render):
+    """Fetch chart data in a background thread, then render it
+
+    fetch is run in the thread and returns data ready to render;
+    the result is reused until the model's data version changes.
+    """
+    version = self.model.data_version
+    cached = self._chart_cache.get(name)
+    if cached and cached[0] == version:
+      render(cached[1])
+      return
+    popup = self._chart_windows[name][0]
+    popup.set_message('Loading…')
+    # Finish the deferred chart imports here rather than in the
+    # thread; lazy imports aren't thread-safe before Python 3.12
+    v.charts.group_rows
+    v.np.ndarray
+    queue = Queue()
+    self._chart_loads[name] = queue
+    m.BackgroundCall(queue, fetch).start()
+    self._check_chart_queue(queue, name, version, render)
+
+  def _check_chart_queue(self, queue, name, version, render):
+    if queue.empty():
+      self.after(
+        50, self._check_chart_queue, queue, name, version, render
+      )
+      return
+    # a newer load for this chart replaces this one
+    if self._chart_loads.get(name) is not queue:
+      return
+    del self._chart_loads[name]
+    item = queue.get()
+    self._chart_windows[name][0].set_message()
+    if item.status == 'error':
+      messagebox.showerror(
+        title='Error', message='Problem loading chart',
+        detail=str(item.body)
+      )
+      return
+    self._chart_cache[name] = (version, item.body)
+    render(item.body)
+
   def show_growth_chart(self, *_):
-    data = self.model.get_growth_by_lab()
-    popup = tk.Toplevel()
-    chart = v.LineChartView(
-       popup, data, (800, 400),
-       'Day', 'Avg Height (cm)', 'lab_id'
+    chart = self._show_chart_window(
+      'growth', 'Growth Chart',
+      lambda popup: v.LineChartView(
+        popup, [], (800, 400),
+        'Day', 'Avg Height (cm)', 'lab_id'
+      )
+    )
+    self._load_chart(
+      'growth',
+      lambda: chart.prepare_data(self.model.get_growth_by_lab()),
+      chart.set_series
     )
-    chart.pack(fill='both', expand=1)
 
   def show_yield_chart(self, *_):
-    popup = tk.Toplevel()
-    chart = v.YieldChartView(
-      popup,
-      'Average plot humidity', 'Average Plot temperature',
-      'Yield as a product of humidity and temperature'
+    chart = self._show_chart_window(
+      'yield', 'Yield Chart',
+      lambda popup: v.YieldChartView(
+        popup,
+        'Average plot humidity', 'Average Plot temperature',
+        'Yield as a product of humidity and temperature'
+      )
+    )
+    self._load_chart(
+      'yield',
+      lambda: chart.prepare_data(
+        self.model.get_yield_by_plot(),
+        'avg_humidity', 'avg_temperature', 'yield', 'seed_sample'
+      ),
+      chart.set_groups
     )
-    chart.pack(fill='both', expand=True)
-    data = self.model.get_yield_by_plot()
-    seed_colors = {
-      'AXM477': 'red', 'AXM478': 'yellow',
-      'AXM479': 'green', 'AXM480': 'blue'
-    }
-    for seed, color in seed_colors.items():
-      seed_data = [
-       (x['avg_humidity'], x['avg_temperature'], x['yield'])
-       for x in data if x['seed_sample'] == seed
-      ]
-      chart.draw_scatter(seed_data, color, seed)
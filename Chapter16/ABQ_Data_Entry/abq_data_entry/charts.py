@@ -0,0 +1,196 @@
+"""Data preparation for the chart views
+
+These functions turn rows from the model into arrays of screen
+coordinates using NumPy, so the views only need to draw them.
+"""
+import numpy as np
+
+
+def group_rows(data, group_field, fields):
+  """Split rows into one tuple of float arrays per value of group_field
+
+  Each tuple has an array per field in fields.  Returns a dict
+  of group: arrays, ordered by group, with the rows of each group
+  sorted by the first field.
+  """
+  if not data:
+    return dict()
+  names, *columns = zip(*(
+    (row[group_field], *(row[field] for field in fields))
+    for row in data
+  ))
+  labels, groups = np.unique(np.array(names), return_inverse=True)
+  columns = [np.array(column, dtype=float) for column in columns]
+  # sort by group, then by the first field within the group
+  order = np.lexsort((columns[0], groups))
+  ends = np.cumsum(np.bincount(groups, minlength=len(labels)))[:-1]
+  split = [np.split(column[order], ends) for column in columns]
+  return {
+    label.item(): tuple(arrays) for label, *arrays in zip(labels, *split)
+  }
+
+
+def group_series(data, x_field, y_field, plot_by_field):
+  """Split rows into one series per value of plot_by_field
+
+  Returns a dict of name: (x, y) arrays, ordered by name,
+  with each series sorted by x.
+  """
+  return group_rows(data, plot_by_field, (x_field, y_field))
+
+
+def data_bounds(series):
+  """Return (x0, x1, y0, y1) covering every series from the origin
+
+  All series share these bounds, so their lines are comparable.
+  """
+  max_x = max((x.max() for x, _ in series.values() if len(x)), default=0)
+  max_y = max((y.max() for _, y in series.values() if len(y)), default=0)
+  return (0.0, float(max_x) or 1.0, 0.0, float(max_y) or 1.0)
+
+
+def to_coords(x, y, bounds, width, height):
+  """Scale x and y in bounds to a flat list of canvas coordinates"""
+  x0, x1, y0, y1 = bounds
+  coords = np.empty(len(x) * 2)
+  coords[0::2] = (x - x0) * (width / (x1 - x0))
+  coords[1::2] = height - (y - y0) * (height / (y1 - y0))
+  return np.rint(coords).tolist()
+
+
+#################
+# Downsampling  #
+#################
+
+def lttb_indices(x, y, points):
+  """Choose points indices with Largest-Triangle-Three-Buckets
+
+  The first and last points are always kept; from each bucket in
+  between, the point making the largest triangle with the point
+  kept before it and the mean of the next bucket is kept.
+  """
+  n = len(x)
+  if points >= n or points < 3:
+    return np.arange(n)
+  edges = np.linspace(1, n - 1, points - 1).astype(int)
+  keep = np.empty(points, dtype=int)
+  keep[0], keep[-1] = 0, n - 1
+  a = 0
+  for i in range(points - 2):
+    start, end = edges[i], edges[i + 1]
+    next_end = edges[i + 2] if i + 2 < len(edges) else n
+    mean_x = x[end:next_end].mean()
+    mean_y = y[end:next_end].mean()
+    area = np.abs(
+      (x[a] - mean_x) * (y[start:end] - y[a])
+      - (x[a] - x[start:end]) * (mean_y - y[a])
+    )
+    a = start + int(area.argmax())
+    keep[i + 1] = a
+  return keep
+
+
+def minmax_indices(x, y, buckets):
+  """Choose the lowest and highest point in each of buckets x ranges
+
+  x must be sorted.  The first and last points are always kept.
+  """
+  n = len(x)
+  if n <= 2 or buckets < 1:
+    return np.arange(n)
+  span = (x[-1] - x[0]) or 1
+  bucket = ((x - x[0]) / span * buckets).astype(int)
+  bucket = np.minimum(bucket, buckets - 1)
+  starts = np.flatnonzero(np.diff(bucket, prepend=-1))
+  ends = np.append(starts[1:], n) - 1
+  # within each bucket, sort by y: the first is the min, the last the max
+  order = np.lexsort((y, bucket))
+  return np.unique(np.concatenate(([0, n - 1], order[starts], order[ends])))
+
+
+def downsample(x, y, points, method='lttb'):
+  """Reduce a series to about points points, keeping its peaks
+
+  method is 'lttb', 'minmax' or None for no downsampling.
+  """
+  if method is None or len(x) <= points:
+    return x, y
+  if method == 'lttb':
+    keep = lttb_indices(x, y, points)
+  elif method == 'minmax':
+    keep = minmax_indices(x, y, max(points // 2, 1))
+  else:
+    raise ValueError(f'Unknown downsampling method: {method}')
+  return x[keep], y[keep]
+
+
+class SeriesPyramid:
+  """Min/max summaries of a series at several resolutions
+
+  Level 0 is the series itself; each level above it keeps the
+  lowest and highest point of every block of factor ** level
+  points.  A zoomed view reads only the coarsest level that still
+  has enough points in its window.  x must be sorted.
+  """
+
+  factor = 4
+  # don't summarize below this many points
+  min_points = 256
+
+  def __init__(self, x, y):
+    self.levels = [(x, y)]
+    size = self.factor
+    while len(x) // size * 2 >= self.min_points:
+      keep = self._block_minmax(y, size)
+      self.levels.append((x[keep], y[keep]))
+      size *= self.factor
+
+  @staticmethod
+  def _block_minmax(y, size):
+    """Return the indices of the min and max of each block of y"""
+    n = len(y)
+    whole = n // size * size
+    blocks = y[:whole].reshape(-1, size)
+    starts = np.arange(0, whole, size)
+    keep = [
+      [0, n - 1],
+      starts + blocks.argmin(axis=1), starts + blocks.argmax(axis=1)
+    ]
+    if whole < n:
+      tail = y[whole:]
+      keep.append([whole + tail.argmin(), whole + tail.argmax()])
+    return np.unique(np.concatenate(keep))
+
+  def window(self, x0, x1, points):
+    """Return the x and y arrays to draw between x0 and x1
+
+    This is the coarsest level with at least points points in the
+    window, plus one point either side so lines reach the edges.
+    """
+    for level in range(len(self.levels) - 1, -1, -1):
+      x, y = self.levels[level]
+      start = max(int(np.searchsorted(x, x0, 'left')) - 1, 0)
+      end = min(int(np.searchsorted(x, x1, 'right')) + 1, len(x))
+      if end - start >= points or level == 0:
+        return x[start:end], y[start:end]
+
+  def nearest(self, x_value):
+    """Return the point of the full series nearest to x_value"""
+    x, y = self.levels[0]
+    if not len(x):
+      return None
+    i = int(np.searchsorted(x, x_value))
+    if i == len(x) or (i > 0 and x_value - x[i - 1] < x[i] - x_value):
+      i -= 1
+    return x[i], y[i]
+
+
+def prepare_series(data, x_field, y_field, plot_by_field):
+  """Group rows into series and summarize each in a SeriesPyramid
+
+  This doesn't touch Tk, so it can run in a background thread.
+  """
+  return {
+    name: SeriesPyramid(x, y) for name, (x, y)
+    in group_series(data, x_field, y_field, plot_by_field).items()
+  }
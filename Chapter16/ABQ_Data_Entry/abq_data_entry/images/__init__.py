@@ -1,11 +1,20 @@
+from base64 import b64decode
 from pathlib import Path
 import sys
+import tkinter as tk
 
 if getattr(sys, 'frozen', False):
   IMAGE_DIRECTORY = Path(sys.executable).parent / 'images'
 else:
   IMAGE_DIRECTORY = Path(__file__).parent
 
+# Image data generated by ``python -m abq_data_entry.images.embed``;
+# when present, images are built from it instead of read from disk.
+try:
+  from .embedded import IMAGES as EMBEDDED_IMAGES
+except ImportError:
+  EMBEDDED_IMAGES = dict()
+
 ABQ_LOGO_16 = IMAGE_DIRECTORY / 'abq_logo-16x10.png'
 ABQ_LOGO_32 = IMAGE_DIRECTORY / 'abq_logo-32x20.png'
 ABQ_LOGO_64 = IMAGE_DIRECTORY / 'abq_logo-64x40.png'
@@ -21,3 +30,34 @@ FORM_ICON = IMAGE_DIRECTORY / 'browser-2x.png'
 # BMP icons
 QUIT_BMP = IMAGE_DIRECTORY / 'x-2x.xbm'
 ABOUT_BMP = IMAGE_DIRECTORY / 'question-mark-2x.xbm'
+
+
+def get_image(widget, path, **options):
+  """Return the image for path, decoding it once per Tk interpreter
+
+  Images are cached on the root window, keyed by path and options,
+  so every window and menu built afterwards shares the same Tk image.
+  .xbm files become BitmapImages, anything else a PhotoImage.
+  """
+  root = widget._root()
+  cache = root.__dict__.setdefault('_image_cache', dict())
+  key = (str(path), tuple(sorted(options.items())))
+  if key not in cache:
+    cache[key] = _load_image(root, Path(path), options)
+  return cache[key]
+
+
+def _load_image(root, path, options):
+  data = EMBEDDED_IMAGES.get(path.name)
+  if path.suffix == '.xbm':
+    if data is not None:
+      # BitmapImage takes the XBM source itself, not base64
+      options['data'] = b64decode(data).decode('ascii')
+    else:
+      options['file'] = path
+    return tk.BitmapImage(master=root, **options)
+  if data is not None:
+    options['data'] = data
+  else:
+    options['file'] = path
+  return tk.PhotoImage(master=root, **options)
@@ -0,0 +1,43 @@
+"""Write the image files into a module as base64 data
+
+Run before freezing the application::
+
+  python3 -m abq_data_entry.images.embed
+
+The images package uses the generated ``embedded`` module when it
+exists, so the frozen build loads its images without file I/O.
+Delete the module, or run this again, after changing an image.
+"""
+from base64 import b64encode
+from pathlib import Path
+
+IMAGE_DIRECTORY = Path(__file__).parent
+MODULE = IMAGE_DIRECTORY / 'embedded.py'
+SUFFIXES = ('.png', '.xbm')
+LINE_LENGTH = 72
+
+
+def write_module(directory=IMAGE_DIRECTORY, module=MODULE):
+  """Write the images in directory to module as a dict of name: base64"""
+  lines = [
+    '"""Image data generated by abq_data_entry.images.embed"""',
+    '',
+    'IMAGES = {'
+  ]
+  for path in sorted(directory.iterdir()):
+    if path.suffix not in SUFFIXES:
+      continue
+    data = b64encode(path.read_bytes()).decode('ascii')
+    lines.append(f'  {path.name!r}: (')
+    lines.extend(
+      f'    {data[i:i + LINE_LENGTH]!r}'
+      for i in range(0, len(data), LINE_LENGTH)
+    )
+    lines.append('  ),')
+  lines.append('}')
+  Path(module).write_text('\n'.join(lines) + '\n', encoding='ascii')
+  return module
+
+
+if __name__ == '__main__':
+  print(f'Wrote {write_module()}')
@@ -0,0 +1,25 @@
+"""Deferred imports for slow-loading dependencies
+
+Database, network and charting libraries take a noticeable part of
+startup to import, but most sessions don't need all of them.
+"""
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+  """Return module name, which is only executed on first attribute access
+
+  A missing module still raises ModuleNotFoundError straight away.
+  """
+  if name in sys.modules:
+    return sys.modules[name]
+  spec = importlib.util.find_spec(name)
+  if spec is None:
+    raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+  loader = importlib.util.LazyLoader(spec.loader)
+  spec.loader = loader
+  module = importlib.util.module_from_spec(spec)
+  sys.modules[name] = module
+  loader.exec_module(module)
+  return module
@@ -26,6 +26,10 @@ class GenericMainMenu(tk.Menu):
 
   styles = {}
 
+  # List only the font families Tk can load as themselves,
+  # rather than substituting another font
+  filter_font_families = False
+
   def _event(self, sequence):
     """Return a callback function that generates the sequence"""
     def callback(*_):
@@ -40,13 +44,14 @@ class GenericMainMenu(tk.Menu):
     # until there is a Tk instance.
     # There isn't one when the class is defined, but there is when
     # the instance is created.
+    # get_image() decodes each image once, however many menus are built.
     self.icons = {
-    #  'file_open': tk.PhotoImage(file=images.SAVE_ICON),
-      'record_list': tk.PhotoImage(file=images.LIST_ICON),
-      'new_record': tk.PhotoImage(file=images.FORM_ICON),
-      'quit': tk.BitmapImage(file=images.QUIT_BMP, foreground='red'),
-      'about': tk.BitmapImage(
-          file=images.ABOUT_BMP, foreground='#CC0', background='#A09'
+    #  'file_open': images.get_image(self, images.SAVE_ICON),
+      'record_list': images.get_image(self, images.LIST_ICON),
+      'new_record': images.get_image(self, images.FORM_ICON),
+      'quit': images.get_image(self, images.QUIT_BMP, foreground='red'),
+      'about': images.get_image(
+          self, images.ABOUT_BMP, foreground='#CC0', background='#A09'
        ),
     }
 
@@ -103,12 +108,32 @@ class GenericMainMenu(tk.Menu):
 
   def _add_font_family_menu(self, menu):
     font_family_menu = tk.Menu(self, tearoff=False, **self.styles)
-    for family in font.families():
+    # Listing the installed fonts can be slow,
+    # so wait until the menu is first opened
+    font_family_menu.configure(
+      postcommand=lambda: self._fill_font_family_menu(font_family_menu)
+    )
+    menu.add_cascade(label='Font family', menu=font_family_menu)
+
+  def _fill_font_family_menu(self, font_family_menu):
+    font_family_menu.configure(postcommand='')
+    families = sorted(set(font.families()))
+    if self.filter_font_families:
+      families = [
+        family for family in families if self._font_is_usable(family)
+      ]
+    for family in families:
       font_family_menu.add_radiobutton(
         label=family, value=family,
         variable=self.settings['font family']
     )
-    menu.add_cascade(label='Font family', menu=font_family_menu)
+
+  def _font_is_usable(self, family):
+    """Return False for vertical fonts and ones Tk would substitute"""
+    if family.startswith('@'):
+      return False
+    actual = self.tk.call('font', 'actual', (family, 10), '-family')
+    return actual.casefold() == family.casefold()
 
   def _add_themes_menu(self, menu):
     style = ttk.Style()
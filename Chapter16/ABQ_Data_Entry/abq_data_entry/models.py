@@ -6,19 +6,207 @@ import platform
 from datetime import datetime
 from urllib.request import urlopen
 from xml.etree import ElementTree
-import requests
-import paramiko
 from threading import Thread, Lock
 from queue import Queue
-from collections import namedtuple
-
-import psycopg2 as pg
-from psycopg2.extras import DictCursor
+from collections import namedtuple, OrderedDict
+from time import monotonic, perf_counter
+from contextlib import contextmanager
+from bisect import bisect_left, bisect_right
 
 from .constants import FieldTypes as FT
+from .lazyimport import lazy_import
+
+# These are only imported when first used
+pg = lazy_import('psycopg2')
+requests = lazy_import('requests')
+paramiko = lazy_import('paramiko')
 
 Message = namedtuple('Message', ['status', 'subject', 'body'])
 
+class ChangeTracker:
+  """Track the rows inserted and updated during this session
+
+  Rowkeys are kept in sets so membership tests stay cheap no matter
+  how many records are saved during a shift.
+  """
+
+  def __init__(self):
+    self.inserted = set()
+    self.updated = set()
+    # rows which are still being saved in the background
+    self.pending = set()
+    # rows whose background save failed, waiting to be reopened
+    self.failed = set()
+
+  def add_inserted(self, rowkey):
+    self.inserted.add(tuple(str(v) for v in rowkey))
+
+  def add_updated(self, rowkey):
+    self.updated.add(tuple(str(v) for v in rowkey))
+
+  def add_pending(self, rowkey):
+    self.pending.add(tuple(str(v) for v in rowkey))
+
+  def resolve_pending(self, rowkey):
+    self.pending.discard(tuple(str(v) for v in rowkey))
+
+  def add_failed(self, rowkey):
+    self.failed.add(tuple(str(v) for v in rowkey))
+
+  def resolve_failed(self, rowkey):
+    self.failed.discard(tuple(str(v) for v in rowkey))
+
+  def tag_for(self, rowkey):
+    """Return the display tag for rowkey, or an empty string"""
+    if rowkey in self.failed:
+      return 'failed'
+    if rowkey in self.pending:
+      return 'pending'
+    if rowkey in self.inserted:
+      return 'inserted'
+    if rowkey in self.updated:
+      return 'updated'
+    return ''
+
+  def clear(self):
+    self.inserted.clear()
+    self.updated.clear()
+
+
+class RecordIndex:
+  """Sort keys and inverted indexes over a set of loaded records
+
+  Sort keys are computed once when records are added, so sorting
+  a column is a single pass over precomputed keys.  Lab, plot and
+  seed sample are indexed by value and dates are kept in a sorted
+  list, so filters resolve to set intersections and bisects.
+  """
+
+  sort_key_functions = {
+    'Date': str,
+    'Time': lambda x: tuple(int(p) for p in str(x).split(':')),
+    'Lab': str,
+    'Plot': int
+  }
+  indexed_fields = {
+    'lab': 'Lab',
+    'plot': 'Plot',
+    'seed_sample': 'Seed Sample'
+  }
+
+  def __init__(self, records=None):
+    self.records = list()
+    self.sort_keys = {field: list() for field in self.sort_key_functions}
+    self.inverted = {field: dict() for field in self.indexed_fields.values()}
+    # sorted list of (date, position) pairs for range queries
+    self.dates = list()
+    self._orders = dict()
+    self.extend(records or [])
+
+  @staticmethod
+  def normalize(value):
+    return '' if value is None else str(value).strip().upper()
+
+  def extend(self, records):
+    """Add records to the index"""
+    start = len(self.records)
+    self.records.extend(records)
+    new_dates = list()
+    for position in range(start, len(self.records)):
+      record = self.records[position]
+      for field, keyfunc in self.sort_key_functions.items():
+        self.sort_keys[field].append(keyfunc(record[field]))
+      for field, index in self.inverted.items():
+        value = self.normalize(record.get(field))
+        index.setdefault(value, set()).add(position)
+      new_dates.append((str(record['Date']), position))
+    self.dates.extend(new_dates)
+    self.dates.sort()
+    self._orders.clear()
+
+  def values(self, field):
+    """Return the distinct indexed values for field"""
+    return sorted(self.inverted[field], key=lambda x: (len(x), x))
+
+  def order(self, field, reverse=False):
+    """Return record positions sorted by field, cached until changed"""
+    key = (field, reverse)
+    if key not in self._orders:
+      self._orders[key] = sorted(
+        range(len(self.records)),
+        key=self.sort_keys[field].__getitem__,
+        reverse=reverse
+      )
+    return self._orders[key]
+
+  def select(self, date_from='', date_to='', **filters):
+    """Return the set of positions matching filters, or None for all"""
+    matches = None
+    for name, value in filters.items():
+      if not value:
+        continue
+      index = self.inverted[self.indexed_fields[name]]
+      positions = index.get(self.normalize(value), set())
+      matches = positions if matches is None else matches & positions
+    if date_from or date_to:
+      lo = bisect_left(self.dates, (date_from,)) if date_from else 0
+      hi = (
+        bisect_right(self.dates, (date_to, len(self.records)))
+        if date_to else len(self.dates)
+      )
+      positions = {position for _, position in self.dates[lo:hi]}
+      matches = positions if matches is None else matches & positions
+    return matches
+
+  def query(self, sort_field=None, reverse=False, **filters):
+    """Return the matching records in display order"""
+    matches = self.select(**filters)
+    if sort_field:
+      positions = self.order(sort_field, reverse)
+      if matches is not None:
+        positions = [p for p in positions if p in matches]
+    elif matches is not None:
+      positions = sorted(matches)
+    else:
+      return list(self.records)
+    return [self.records[p] for p in positions]
+
+
+class LookupCache:
+  """A least-recently-used cache whose entries expire after ttl seconds"""
+
+  def __init__(self, maxsize=512, ttl=300):
+    self.maxsize = maxsize
+    self.ttl = ttl
+    self._data = OrderedDict()
+    self._lock = Lock()
+
+  def get(self, key):
+    """Return the cached value for key, or raise KeyError"""
+    with self._lock:
+      expires, value = self._data[key]
+      if expires < monotonic():
+        del self._data[key]
+        raise KeyError(key)
+      self._data.move_to_end(key)
+      return value
+
+  def set(self, key, value):
+    with self._lock:
+      self._data[key] = (monotonic() + self.ttl, value)
+      self._data.move_to_end(key)
+      while len(self._data) > self.maxsize:
+        self._data.popitem(last=False)
+
+  def discard(self, key):
+    with self._lock:
+      self._data.pop(key, None)
+
+  def clear(self):
+    with self._lock:
+      self._data.clear()
+
+
 class SQLModel:
   """Data Model for SQL data storage"""
 
@@ -65,6 +253,13 @@ class SQLModel:
     '(SELECT id FROM lab_techs WHERE name LIKE %(Technician)s))'
   )
 
+  lc_upsert_query = (
+    'INSERT INTO lab_checks VALUES (%(Date)s, %(Time)s, %(Lab)s, '
+    '(SELECT id FROM lab_techs WHERE name = %(Technician)s)) '
+    'ON CONFLICT (date, time, lab_id) DO UPDATE '
+    'SET lab_tech_id = EXCLUDED.lab_tech_id'
+  )
+
   pc_update_query = (
     'UPDATE plot_checks SET date=%(Date)s, time=%(Time)s, '
     'lab_id=%(Lab)s, plot=%(Plot)s,  seed_sample = %(Seed Sample)s, '
@@ -85,8 +280,14 @@ class SQLModel:
     ' %(Med Height)s, %(Notes)s)')
 
   def __init__(self, host, database, user, password):
+    from psycopg2.extras import DictCursor
     self.connection = pg.connect(host=host, database=database,
       user=user, password=password, cursor_factory=DictCursor)
+    # queries may come from background threads
+    self._lock = Lock()
+    # bumped whenever records are saved, so cached reports
+    # can tell if they are out of date
+    self.data_version = 0
 
     techs = self.query("SELECT name FROM lab_techs ORDER BY name")
     labs = self.query("SELECT id FROM labs ORDER BY id")
@@ -96,7 +297,7 @@ class SQLModel:
     self.fields['Plot']['values'] = [str(x['plot']) for x in plots]
 
   def query(self, query, parameters=None):
-    with self.connection:
+    with self._lock, self.connection:
       with self.connection.cursor() as cursor:
         cursor.execute(query, parameters)
       # cursor.description is None when
@@ -104,16 +305,106 @@ class SQLModel:
         if cursor.description is not None:
           return cursor.fetchall()
 
-  def get_all_records(self, all_dates=False):
+  record_filter_clause = (
+    '(%(lab)s IS NULL OR "Lab" = %(lab)s) '
+    'AND (%(plot)s IS NULL OR "Plot" = %(plot)s) '
+    'AND (%(date_from)s IS NULL OR "Date" >= %(date_from)s) '
+    'AND (%(date_to)s IS NULL OR "Date" <= %(date_to)s) '
+    'AND (%(seed_sample)s IS NULL '
+    'OR upper("Seed Sample") = upper(%(seed_sample)s)) '
+  )
+
+  @staticmethod
+  def _filter_parameters(
+    lab='', plot='', date_from='', date_to='', seed_sample=''
+  ):
+    return {
+      'lab': lab or None,
+      'plot': plot or None,
+      'date_from': date_from or None,
+      'date_to': date_to or None,
+      'seed_sample': seed_sample or None
+    }
+
+  def get_all_records(self, all_dates=False, **filters):
     """Return all records.
 
     By default, only return today's records, unless
-    all_dates is True.
+    all_dates is True or any filter value is given,
+    in which case the filters are applied to all dates.
     """
+    parameters = self._filter_parameters(**filters)
+    all_dates = all_dates or any(parameters.values())
     query = ('SELECT * FROM data_record_view '
-      'WHERE %(all_dates)s OR "Date" = CURRENT_DATE '
+      'WHERE (%(all_dates)s OR "Date" = CURRENT_DATE) '
+      'AND ' + self.record_filter_clause +
       'ORDER BY "Date" DESC, "Time", "Lab", "Plot"')
-    return self.query(query, {'all_dates': all_dates})
+    return self.query(query, {'all_dates': all_dates, **parameters})
+
+  def get_records_page(self, after=None, limit=200, **filters):
+    """Return a page of records, newest first.
+
+    after is the rowkey of the last record of the previous page,
+    or None for the first page.  Uses keyset pagination, so
+    later pages cost the same as the first one.
+    """
+    parameters = self._filter_parameters(**filters)
+    date, time, lab, plot = after or (None, None, None, None)
+    parameters.update({
+      'after_date': date, 'after_time': time,
+      'after_lab': lab, 'after_plot': plot, 'limit': limit
+    })
+    query = ('SELECT * FROM data_record_view '
+      'WHERE (%(after_date)s IS NULL OR "Date" < %(after_date)s '
+      'OR ("Date" = %(after_date)s AND ("Time", "Lab", "Plot") > '
+      '(%(after_time)s, %(after_lab)s, %(after_plot)s))) '
+      'AND ' + self.record_filter_clause +
+      'ORDER BY "Date" DESC, "Time", "Lab", "Plot" '
+      'LIMIT %(limit)s')
+    return self.query(query, parameters)
+
+  search_headline_options = (
+    'StartSel=«, StopSel=», MaxFragments=1, MaxWords=12, MinWords=4'
+  )
+
+  def search_records(self, query, limit=100):
+    """Search record notes and seed samples, best matches first.
+
+    Notes are matched with full-text search, seed samples by
+    substring.  Requires the indexes in sql/add_search_indexes.sql.
+    Each record has extra "Rank" and "Match" keys, "Match" being
+    the matching part of the notes with the search terms marked.
+    """
+    from psycopg2 import errors
+    pattern = '%{}%'.format(
+      query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    )
+    sql = (
+      'WITH matches AS ('
+      'SELECT date, time, lab_id, plot, notes, q, '
+      'ts_rank(notes_tsv, q) + similarity(seed_sample::text, %(query)s) '
+      'AS rank FROM plot_checks, '
+      "websearch_to_tsquery('english', %(query)s) AS q "
+      'WHERE notes_tsv @@ q OR seed_sample::text ILIKE %(pattern)s '
+      'ORDER BY rank DESC LIMIT %(limit)s) '
+      'SELECT v.*, m.rank AS "Rank", '
+      "replace(ts_headline('english', coalesce(m.notes, ''), m.q, "
+      "%(options)s), E'\\n', ' ') AS \"Match\" "
+      'FROM matches AS m JOIN data_record_view AS v '
+      'ON v."Date" = m.date AND v."Lab" = m.lab_id AND v."Plot" = m.plot '
+      'AND v."Time" = to_char(m.time, \'FMHH24:MI\') '
+      'ORDER BY m.rank DESC, v."Date" DESC'
+    )
+    try:
+      return self.query(sql, {
+        'query': query, 'pattern': pattern, 'limit': limit,
+        'options': self.search_headline_options
+      })
+    except (errors.UndefinedColumn, errors.UndefinedFunction):
+      raise Exception(
+        'This database has not been set up for searching; '
+        'run sql/add_search_indexes.sql against it.'
+      )
 
   def get_record(self, rowkey):
     """Return a single record
@@ -161,6 +452,26 @@ class SQLModel:
 
     self.query(lc_query, record)
     self.query(pc_query, record)
+    with self._lock:
+      self.data_version += 1
+
+  def save_records(self, records):
+    """Save a list of new records in a single transaction
+
+    Used for saving a whole lab sheet at once; either every
+    record is saved or none are.
+    """
+    from psycopg2.extras import execute_batch
+    lab_checks = {
+      (r['Date'], r['Time'], r['Lab']): r for r in records
+    }
+    with self._lock, self.connection:
+      with self.connection.cursor() as cursor:
+        execute_batch(
+          cursor, self.lc_upsert_query, list(lab_checks.values())
+        )
+        execute_batch(cursor, self.pc_insert_query, records)
+      self.data_version += 1
 
   def get_lab_check(self, date, time, lab):
     """Retrieve the lab check record for the given date, time, and lab"""
@@ -172,6 +483,44 @@ class SQLModel:
       query, {'date': date, 'time': time, 'lab': lab})
     return results[0] if results else dict()
 
+  def plot_check_exists(self, date, time, lab, plot):
+    """Return True if a record exists for the date, time, lab, and plot"""
+    result = self.query('SELECT 1 FROM plot_checks WHERE date=%(date)s '
+      'AND time=%(time)s AND lab_id=%(lab)s AND plot=%(plot)s',
+      {'date': date, 'time': time, 'lab': lab, 'plot': plot})
+    return bool(result)
+
+  def get_lab_sheet(self, date, time, lab):
+    """Get everything needed to fill in one lab check in one query
+
+    Returns a dict with the lab check ('lab_check', empty if there is
+    none yet), each plot's current seed sample ('seed_samples'), and
+    the set of plots which already have a record ('recorded_plots').
+    Plot numbers are returned as strings, as they are in the form.
+    """
+    query = (
+      'SELECT p.plot, p.current_seed_sample, lt.name AS lab_tech, '
+      'pc.plot IS NOT NULL AS recorded FROM plots AS p '
+      'LEFT JOIN lab_checks AS lc ON lc.lab_id = p.lab_id '
+      'AND lc.date = %(date)s AND lc.time = %(time)s '
+      'LEFT JOIN lab_techs AS lt ON lt.id = lc.lab_tech_id '
+      'LEFT JOIN plot_checks AS pc ON pc.lab_id = p.lab_id '
+      'AND pc.plot = p.plot AND pc.date = %(date)s AND pc.time = %(time)s '
+      'WHERE p.lab_id = %(lab)s ORDER BY p.plot'
+    )
+    rows = self.query(query, {'date': date, 'time': time, 'lab': lab})
+    lab_tech = rows[0]['lab_tech'] if rows else None
+    return {
+      'lab_check': {'lab_tech': lab_tech} if lab_tech else dict(),
+      'seed_samples': {
+        str(row['plot']): row['current_seed_sample'] or ''
+        for row in rows
+      },
+      'recorded_plots': {
+        str(row['plot']) for row in rows if row['recorded']
+      }
+    }
+
   def get_current_seed_sample(self, lab, plot):
     """Get the seed sample currently planted in the given lab and plot"""
     result = self.query('SELECT current_seed_sample FROM plots '
@@ -356,6 +705,12 @@ class SettingsModel:
     filename = 'abq_settings.json'
     filedir = self.config_dirs.get(platform.system(), Path.home())
     self.filepath = filedir / filename
+    # the JSON last written to or read from the file, and a count
+    # of the saves requested, so a late write can't undo a newer one
+    self._saved = None
+    self._requests = 0
+    self._written = 0
+    self._write_lock = Lock()
 
     # load in saved values
     self.load()
@@ -371,10 +726,34 @@ class SettingsModel:
       raise ValueError("Bad key or wrong variable type")
 
   def save(self):
-    """Save the current settings to the file"""
-    json_string = json.dumps(self.fields)
-    with open(self.filepath, 'w', encoding='utf-8') as fh:
-      fh.write(json_string)
+    """Save the current settings to the file, if they have changed"""
+    self._requests += 1
+    self._write(json.dumps(self.fields), self._requests)
+
+  def save_in_background(self):
+    """Save the settings like save(), writing the file in a thread"""
+    self._requests += 1
+    Thread(
+      target=self._write, args=(json.dumps(self.fields), self._requests)
+    ).start()
+
+  def _write(self, json_string, request):
+    """Replace the file with json_string
+
+    The settings are written to a temporary file which is then
+    renamed over the old one, so the file is never half written.
+    """
+    with self._write_lock:
+      if request < self._written or json_string == self._saved:
+        return
+      temp_path = self.filepath.with_name(self.filepath.name + '.tmp')
+      with open(temp_path, 'w', encoding='utf-8') as fh:
+        fh.write(json_string)
+        fh.flush()
+        os.fsync(fh.fileno())
+      os.replace(temp_path, self.filepath)
+      self._saved = json_string
+      self._written = request
 
   def load(self):
     """Load the settings from the file"""
@@ -392,6 +771,42 @@ class SettingsModel:
       if key in raw_values and 'value' in raw_values[key]:
         raw_value = raw_values[key]['value']
         self.fields[key]['value'] = raw_value
+    self._saved = json.dumps(self.fields)
+
+class StartupTracer:
+  """Records how long each phase of startup takes
+
+  Wrap each phase in a phase() block, then call write() to
+  append the timings to a log file.
+  """
+
+  def __init__(self):
+    self.start = perf_counter()
+    # (name, start offset, duration) in seconds
+    self.phases = list()
+
+  @contextmanager
+  def phase(self, name):
+    start = perf_counter()
+    try:
+      yield
+    finally:
+      self.phases.append((name, start - self.start, perf_counter() - start))
+
+  def write(self, filepath):
+    """Append the phases to the log; startup carries on if this fails"""
+    total = perf_counter() - self.start
+    lines = [f'{datetime.now():%Y-%m-%d %H:%M:%S} startup: {total:.3f}s']
+    lines.extend(
+      f'  {name:<32} at {offset:7.3f}s took {duration:7.3f}s'
+      for name, offset, duration in self.phases
+    )
+    try:
+      with open(filepath, 'a', encoding='utf-8') as fh:
+        fh.write('\n'.join(lines) + '\n')
+    except OSError:
+      pass
+
 
 class WeatherDataModel:
 
@@ -422,6 +837,58 @@ class WeatherDataModel:
 
 
 
+class BackgroundCall(Thread):
+  """Call a function in a thread and put the outcome on a queue"""
+
+  def __init__(self, queue, function, *args, **kwargs):
+    super().__init__(daemon=True)
+    self.queue = queue
+    self.function = function
+    self.args = args
+    self.kwargs = kwargs
+
+  def run(self):
+    try:
+      result = self.function(*self.args, **self.kwargs)
+    except Exception as e:
+      self.queue.put(Message('error', self.function.__name__, e))
+    else:
+      self.queue.put(Message('done', self.function.__name__, result))
+
+
+class ThreadedSaver(Thread):
+  """Save records with a model in the background, in order
+
+  Each outcome is put on the results queue as a Message whose
+  body is a tuple of (record, rowkey, exception or None, origin),
+  origin being whatever was passed to save() with the record.
+  """
+
+  def __init__(self, model, results):
+    super().__init__(daemon=True)
+    self.model = model
+    self.results = results
+    self.jobs = Queue()
+
+  def save(self, record, rowkey, origin=None):
+    self.jobs.put((record, rowkey, origin))
+
+  def run(self):
+    while True:
+      record, rowkey, origin = self.jobs.get()
+      try:
+        # save_record adds keys to the dict, so give it a copy
+        self.model.save_record(dict(record), rowkey)
+      except Exception as e:
+        self.results.put(
+          Message('error', 'Save Failed', (record, rowkey, e, origin))
+        )
+      else:
+        self.results.put(
+          Message('done', 'Record Saved', (record, rowkey, None, origin))
+        )
+
+
 class ThreadedUploader(Thread):
 
   upload_lock = Lock()
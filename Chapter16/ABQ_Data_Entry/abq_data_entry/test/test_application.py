@@ -1,5 +1,7 @@
 from unittest import TestCase
-from unittest.mock import patch
+from unittest.mock import ANY, Mock, patch
+from datetime import date
+from queue import Queue
 from .. import application
 
 
@@ -37,12 +39,14 @@ class TestApplication(TestCase):
       patch('abq_data_entry.application.Application._show_login') as show_login,\
       patch('abq_data_entry.application.v.DataRecordForm'),\
       patch('abq_data_entry.application.v.RecordList'),\
+      patch('abq_data_entry.application.v.LabSheetView'),\
       patch('abq_data_entry.application.ttk.Notebook'),\
       patch('abq_data_entry.application.get_main_menu_for_os')\
     :
 
       settingsmodel().fields = self.settings
       csvmodel().get_all_records.return_value = self.records
+      csvmodel().get_records_page.return_value = self.records
       show_login.return_value = True
       self.app = application.Application()
 
@@ -58,15 +62,187 @@ class TestApplication(TestCase):
   def test_populate_recordlist(self):
     # test correct functions
     self.app._populate_recordlist()
-    self.app.model.get_all_records.assert_called()
-    self.app.recordlist.populate.assert_called_with(self.records)
+    self.app.model.get_records_page.assert_called()
+    self.app.recordlist.populate.assert_called_with(self.records, {})
 
     # test exceptions
 
-    self.app.model.get_all_records.side_effect = Exception('Test message')
+    self.app.model.get_records_page.side_effect = Exception('Test message')
     with patch('abq_data_entry.application.messagebox'):
       self.app._populate_recordlist()
       application.messagebox.showerror.assert_called_with(
         title='Error', message='Problem reading file',
         detail='Test message'
       )
+
+
+class TestFailedSaves(TestCase):
+  """Failed background saves, using a mock in place of the window"""
+
+  record = TestApplication.records[0]
+  rowkey = ('2018-06-01', '8:00', 'A', '1')
+
+  def setUp(self):
+    self.app = Mock(failed_saves=dict())
+    self.app._display_key = application.Application._display_key
+    self.form = Mock()
+    patcher = patch('abq_data_entry.application.messagebox')
+    self.messagebox = patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def save_failed(self):
+    application.Application._save_failed(
+      self.app, self.form, self.record, None, 'Test error'
+    )
+
+  def test_untouched_form_restored(self):
+    self.form.has_changes.return_value = False
+    self.save_failed()
+    self.form.restore.assert_called_with(None, self.record, 'Test error')
+    self.assertEqual(self.app.failed_saves, {})
+    self.messagebox.showerror.assert_called()
+
+  def test_restored_to_originating_form(self):
+    self.form.has_changes.return_value = False
+    self.save_failed()
+    self.form.master.show.assert_called()
+    self.app.notebook.select.assert_not_called()
+    self.app.recordform.restore.assert_not_called()
+
+  def test_edited_form_left_alone(self):
+    self.form.has_changes.return_value = True
+    self.save_failed()
+    self.form.restore.assert_not_called()
+    self.assertEqual(
+      self.app.failed_saves, {self.rowkey: (None, self.record, 'Test error')}
+    )
+    self.app.changes.add_failed.assert_called_with(self.rowkey)
+    self.app.recordlist.refresh.assert_called()
+
+  def test_unsaved_changes_not_clobbered(self):
+    # the technician has started typing the next record
+    form = application.v.DataRecordForm.__new__(application.v.DataRecordForm)
+    form._vars = {'Notes': Mock()}
+    form._modified = form._filling = False
+    form._on_var_write()
+    form.winfo_exists = Mock(return_value=True)
+    form.restore = Mock()
+    self.form = form
+    self.save_failed()
+    form.restore.assert_not_called()
+    self.assertIn(self.rowkey, self.app.failed_saves)
+
+  def test_reopen_failed_save(self):
+    self.app.failed_saves[self.rowkey] = (None, self.record, 'Test error')
+    self.app.recordlist.selected_id = self.rowkey
+    reopened = application.Application._reopen_failed_save(
+      self.app, self.form
+    )
+    self.assertTrue(reopened)
+    self.form.restore.assert_called_with(None, self.record, 'Test error')
+    self.app.changes.resolve_failed.assert_called_with(self.rowkey)
+    self.assertEqual(self.app.failed_saves, {})
+
+
+class TestRecordPaging(TestCase):
+  """Loading further pages, using a mock in place of the window"""
+
+  def setUp(self):
+    self.app = Mock(
+      page_size=2, records_loaded=2, _page_generation=1,
+      record_filters={'lab': 'A'}
+    )
+
+  @patch('abq_data_entry.application.m.BackgroundCall')
+  def test_after_last_loaded_record(self, background_call):
+    self.app.recordlist.index.records = [
+      {'Date': date(2021, 6, 2), 'Time': '8:00', 'Lab': 'A', 'Plot': 1},
+      {'Date': date(2021, 6, 1), 'Time': '12:00', 'Lab': 'A', 'Plot': 3}
+    ]
+    application.Application._load_more_records(self.app)
+    _, function = background_call.call_args[0]
+    self.assertEqual(function, self.app.model.get_records_page)
+    self.assertEqual(background_call.call_args[1], {
+      'after': ('2021-06-01', '12:00', 'A', '3'), 'limit': 2, 'lab': 'A'
+    })
+    self.app._check_page_queue.assert_called_with(ANY, 1)
+
+  @patch('abq_data_entry.application.m.BackgroundCall')
+  def test_first_page_has_no_after(self, background_call):
+    self.app.recordlist.index.records = []
+    application.Application._load_more_records(self.app)
+    self.assertIsNone(background_call.call_args[1]['after'])
+
+  def check_page(self, rows, generation=1):
+    queue = Queue()
+    queue.put(application.m.Message('done', 'get_records_page', rows))
+    application.Application._check_page_queue(self.app, queue, generation)
+
+  def test_stale_generation_discarded(self):
+    # the list was reloaded while the page was fetched
+    self.app._page_generation = 2
+    self.check_page([{}, {}])
+    self.app.recordlist.append.assert_not_called()
+    self.assertEqual(self.app.records_loaded, 2)
+    self.assertFalse(self.app.recordlist.loading)
+
+  def test_full_page_is_not_complete(self):
+    self.check_page([{}, {}])
+    self.app.recordlist.append.assert_called_with([{}, {}])
+    self.assertFalse(self.app.recordlist.complete)
+    self.assertFalse(self.app.recordlist.loading)
+    self.assertEqual(self.app.records_loaded, 4)
+
+  def test_short_page_is_complete(self):
+    self.check_page([{}])
+    self.assertTrue(self.app.recordlist.complete)
+
+  def test_reload_complete(self):
+    self.app.record_search = ''
+    self.app.records_loaded = 0
+    self.app.model.get_records_page.return_value = [{}]
+    application.Application._populate_recordlist(self.app)
+    self.assertEqual(self.app._page_generation, 2)
+    self.app.model.get_records_page.assert_called_with(limit=2, lab='A')
+    self.assertTrue(self.app.recordlist.complete)
+    self.app.recordlist.populate.assert_called_with([{}], {'lab': 'A'})
+
+  @patch('abq_data_entry.application.messagebox')
+  def test_reload_error(self, messagebox):
+    self.app.record_search = ''
+    self.app.recordlist.loading = True
+    self.app.recordlist.complete = False
+    self.app.model.get_records_page.side_effect = IOError('gone')
+    application.Application._populate_recordlist(self.app)
+    messagebox.showerror.assert_called()
+    self.app.recordlist.populate.assert_not_called()
+    self.assertFalse(self.app.recordlist.loading)
+    self.assertTrue(self.app.recordlist.complete)
+
+
+@patch('abq_data_entry.application.v.LabSheetView')
+class TestLabSheetTab(TestCase):
+  """The lab sheet is built when its tab is first selected"""
+
+  def setUp(self):
+    self.app = Mock(labsheet=None)
+    self.app._labsheet_tab.__str__ = Mock(return_value='.tab')
+
+  def test_other_tab(self, labsheetview):
+    self.app.notebook.select.return_value = '.recordform'
+    application.Application._on_tab_changed(self.app)
+    labsheetview.assert_not_called()
+    self.assertIsNone(self.app.labsheet)
+
+  def test_built_once(self, labsheetview):
+    self.app.notebook.select.return_value = '.tab'
+    application.Application._on_tab_changed(self.app)
+    application.Application._on_tab_changed(self.app)
+    labsheetview.assert_called_once_with(
+      self.app._labsheet_tab, self.app.model, self.app.settings,
+      self.app.recordform.autofill
+    )
+    self.assertEqual(self.app.labsheet, labsheetview.return_value)
+    self.app.labsheet.bind.assert_called_with(
+      '<<SaveLabSheet>>', self.app._on_save_sheet
+    )
@@ -0,0 +1,66 @@
+from .. import charts
+from unittest import TestCase
+import numpy as np
+
+
+class TestCharts(TestCase):
+
+  data = [
+    {'day': 2, 'height': 4, 'lab': 'B'},
+    {'day': 1, 'height': 2, 'lab': 'A'},
+    {'day': 1, 'height': 1, 'lab': 'B'},
+    {'day': 2, 'height': 3, 'lab': 'A'},
+  ]
+
+  def test_group_series(self):
+    series = charts.group_series(self.data, 'day', 'height', 'lab')
+    self.assertEqual(list(series), ['A', 'B'])
+    x, y = series['B']
+    self.assertEqual(x.tolist(), [1, 2])
+    self.assertEqual(y.tolist(), [1, 4])
+    self.assertEqual(charts.group_series([], 'day', 'height', 'lab'), {})
+
+  def test_group_rows(self):
+    groups = charts.group_rows(self.data, 'lab', ('height', 'day'))
+    self.assertEqual(list(groups), ['A', 'B'])
+    height, day = groups['A']
+    self.assertEqual(height.tolist(), [2, 3])
+    self.assertEqual(day.tolist(), [1, 2])
+
+  def test_shared_scale(self):
+    series = charts.group_series(self.data, 'day', 'height', 'lab')
+    bounds = charts.data_bounds(series)
+    self.assertEqual(bounds, (0, 2, 0, 4))
+    coords = charts.to_coords(*series['A'], bounds, 100, 40)
+    self.assertEqual(coords, [50, 20, 100, 10])
+
+  def test_downsample(self):
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    y[500] = 10  # a peak which must survive
+    for method in ('lttb', 'minmax'):
+      dx, dy = charts.downsample(x, y, 100, method)
+      self.assertLessEqual(len(dx), 102)
+      self.assertEqual((dx[0], dx[-1]), (0, 999))
+      self.assertIn(10, dy)
+      self.assertTrue((np.diff(dx) > 0).all())
+    self.assertEqual(len(charts.downsample(x, y, 100, None)[0]), 1000)
+    with self.assertRaises(ValueError):
+      charts.downsample(x, y, 100, 'bogus')
+
+  def test_pyramid(self):
+    x = np.arange(10000, dtype=float)
+    y = np.cos(x / 100)
+    y[5000] = 10
+    pyramid = charts.SeriesPyramid(x, y)
+    self.assertGreater(len(pyramid.levels), 2)
+    # the whole series reads from a coarse level, keeping the peak
+    wx, wy = pyramid.window(0, 9999, 200)
+    self.assertLess(len(wx), 10000)
+    self.assertGreaterEqual(len(wx), 200)
+    self.assertIn(10, wy)
+    # a narrow window reads the raw points around it
+    wx, wy = pyramid.window(100, 110, 200)
+    self.assertEqual((wx[0], wx[-1]), (99, 111))
+    self.assertEqual(pyramid.nearest(41.4), (41, y[41]))
+    self.assertEqual(pyramid.nearest(1e6), (9999, y[9999]))
@@ -0,0 +1,46 @@
+from .. import images
+from ..images import embed
+from base64 import b64decode
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+import runpy
+
+
+class TestImageCache(TestCase):
+
+  def setUp(self):
+    self.root = mock.Mock(spec=[])
+    self.widget = mock.Mock()
+    self.widget._root.return_value = self.root
+
+  @mock.patch('abq_data_entry.images.tk.PhotoImage')
+  def test_photo_decoded_once(self, photo):
+    first = images.get_image(self.widget, images.LIST_ICON)
+    second = images.get_image(self.widget, images.LIST_ICON)
+    self.assertIs(first, second)
+    photo.assert_called_once_with(master=self.root, file=images.LIST_ICON)
+
+  @mock.patch('abq_data_entry.images.tk.BitmapImage')
+  def test_bitmap_keyed_by_options(self, bitmap):
+    images.get_image(self.widget, images.QUIT_BMP, foreground='red')
+    images.get_image(self.widget, images.QUIT_BMP, foreground='red')
+    images.get_image(self.widget, images.QUIT_BMP, foreground='blue')
+    self.assertEqual(bitmap.call_count, 2)
+
+  @mock.patch('abq_data_entry.images.tk.BitmapImage')
+  @mock.patch('abq_data_entry.images.tk.PhotoImage')
+  def test_embedded_data(self, photo, bitmap):
+    with TemporaryDirectory() as directory:
+      module = embed.write_module(module=Path(directory) / 'embedded.py')
+      data = runpy.run_path(str(module))['IMAGES']
+    self.assertEqual(
+      b64decode(data['list-2x.png']), images.LIST_ICON.read_bytes()
+    )
+    with mock.patch.object(images, 'EMBEDDED_IMAGES', data):
+      images.get_image(self.widget, images.LIST_ICON)
+      images.get_image(self.widget, images.QUIT_BMP)
+    photo.assert_called_once_with(master=self.root, data=data['list-2x.png'])
+    bitmap.assert_called_once_with(
+      master=self.root, data=images.QUIT_BMP.read_text()
+    )
@@ -3,6 +3,8 @@ from unittest import TestCase
 from unittest import mock
 
 from pathlib import Path
+import platform
+import tempfile
 
 class TestCSVModel(TestCase):
 
@@ -135,3 +137,220 @@ class TestCSVModel(TestCase):
       ])
       with self.assertRaises(IndexError):
         self.model2.save_record(record, 2)
+
+
+class TestSQLModelPaging(TestCase):
+  """Keyset paging queries, with the database query mocked"""
+
+  def setUp(self):
+    self.model = models.SQLModel.__new__(models.SQLModel)
+    self.model.query = mock.Mock(return_value=[])
+
+  def parameters(self):
+    return self.model.query.call_args[0][1]
+
+  def test_first_page(self):
+    self.model.get_records_page(limit=50, lab='A')
+    parameters = self.parameters()
+    self.assertIsNone(parameters['after_date'])
+    self.assertEqual(parameters['limit'], 50)
+    self.assertEqual(parameters['lab'], 'A')
+    self.assertIsNone(parameters['plot'])
+
+  def test_after(self):
+    self.model.get_records_page(after=('2021-06-01', '8:00', 'A', '3'))
+    parameters = self.parameters()
+    self.assertEqual(
+      (
+        parameters['after_date'], parameters['after_time'],
+        parameters['after_lab'], parameters['after_plot']
+      ),
+      ('2021-06-01', '8:00', 'A', '3')
+    )
+    # the page continues after the key in the order the rows are sorted
+    sql = self.model.query.call_args[0][0]
+    self.assertIn('("Time", "Lab", "Plot") >', sql)
+    self.assertIn('ORDER BY "Date" DESC, "Time", "Lab", "Plot"', sql)
+
+
+class TestSQLModelSearch(TestCase):
+
+  def setUp(self):
+    self.model = models.SQLModel.__new__(models.SQLModel)
+    self.model.query = mock.Mock(return_value=[])
+
+  def test_escapes_pattern(self):
+    self.model.search_records('50%_')
+    parameters = self.model.query.call_args[0][1]
+    self.assertEqual(parameters['pattern'], '%50\\%\\_%')
+
+  def test_missing_indexes(self):
+    from psycopg2 import errors
+    self.model.query.side_effect = errors.UndefinedColumn(
+      'column "notes_tsv" does not exist'
+    )
+    with self.assertRaisesRegex(Exception, 'add_search_indexes.sql'):
+      self.model.search_records('blight')
+
+
+class TestChangeTracker(TestCase):
+
+  def setUp(self):
+    self.tracker = models.ChangeTracker()
+
+  def test_tag_for(self):
+    self.tracker.add_inserted(('2021-06-01', '8:00', 'A', 1))
+    self.tracker.add_updated(('2021-06-01', '8:00', 'A', '2'))
+
+    self.assertEqual(
+      self.tracker.tag_for(('2021-06-01', '8:00', 'A', '1')), 'inserted'
+    )
+    self.assertEqual(
+      self.tracker.tag_for(('2021-06-01', '8:00', 'A', '2')), 'updated'
+    )
+    self.assertEqual(
+      self.tracker.tag_for(('2021-06-01', '8:00', 'A', '3')), ''
+    )
+
+  def test_inserted_wins_over_updated(self):
+    rowkey = ('2021-06-01', '8:00', 'A', '1')
+    self.tracker.add_inserted(rowkey)
+    self.tracker.add_updated(rowkey)
+    self.assertEqual(self.tracker.tag_for(rowkey), 'inserted')
+
+  def test_clear(self):
+    rowkey = ('2021-06-01', '8:00', 'A', '1')
+    self.tracker.add_inserted(rowkey)
+    self.tracker.clear()
+    self.assertEqual(self.tracker.tag_for(rowkey), '')
+
+  def test_pending(self):
+    rowkey = ('2021-06-01', '8:00', 'A', '1')
+    self.tracker.add_inserted(rowkey)
+    self.tracker.add_pending(rowkey)
+    self.assertEqual(self.tracker.tag_for(rowkey), 'pending')
+    self.tracker.resolve_pending(rowkey)
+    self.assertEqual(self.tracker.tag_for(rowkey), 'inserted')
+
+  def test_failed(self):
+    rowkey = ('2021-06-01', '8:00', 'A', '1')
+    self.tracker.add_failed(('2021-06-01', '8:00', 'A', 1))
+    self.assertEqual(self.tracker.tag_for(rowkey), 'failed')
+    self.tracker.resolve_failed(rowkey)
+    self.assertEqual(self.tracker.tag_for(rowkey), '')
+
+
+class TestRecordIndex(TestCase):
+
+  records = [
+    {'Date': '2021-06-02', 'Time': '8:00', 'Lab': 'A', 'Plot': 2,
+     'Seed Sample': 'AXM478'},
+    {'Date': '2021-06-01', 'Time': '12:00', 'Lab': 'B', 'Plot': 10,
+     'Seed Sample': 'AXM477'},
+    {'Date': '2021-06-01', 'Time': '8:00', 'Lab': 'A', 'Plot': 1,
+     'Seed Sample': 'AXM477'},
+  ]
+
+  def setUp(self):
+    self.index = models.RecordIndex(self.records)
+
+  def test_query_unsorted(self):
+    self.assertEqual(self.index.query(), self.records)
+
+  def test_sort(self):
+    plots = [r['Plot'] for r in self.index.query('Plot')]
+    self.assertEqual(plots, [1, 2, 10])
+    times = [r['Time'] for r in self.index.query('Time', reverse=True)]
+    self.assertEqual(times, ['12:00', '8:00', '8:00'])
+
+  def test_filter(self):
+    result = self.index.query(lab='a')
+    self.assertEqual([r['Plot'] for r in result], [2, 1])
+    result = self.index.query(seed_sample='axm477', plot='10')
+    self.assertEqual(result, [self.records[1]])
+    result = self.index.query(date_from='2021-06-02')
+    self.assertEqual(result, [self.records[0]])
+    result = self.index.query('Plot', date_to='2021-06-01')
+    self.assertEqual([r['Plot'] for r in result], [1, 10])
+    self.assertEqual(self.index.query(lab='C'), [])
+
+  def test_extend(self):
+    self.index.query('Plot')
+    self.index.extend([
+      {'Date': '2021-05-31', 'Time': '8:00', 'Lab': 'C', 'Plot': 5,
+       'Seed Sample': 'AXM480'}
+    ])
+    plots = [r['Plot'] for r in self.index.query('Plot')]
+    self.assertEqual(plots, [1, 2, 5, 10])
+    self.assertEqual(self.index.values('Lab'), ['A', 'B', 'C'])
+
+
+class TestLookupCache(TestCase):
+
+  def setUp(self):
+    self.cache = models.LookupCache(maxsize=2, ttl=10)
+
+  def test_get_set(self):
+    self.cache.set(('seed_sample', 'A', '1'), 'AXM477')
+    self.assertEqual(self.cache.get(('seed_sample', 'A', '1')), 'AXM477')
+    with self.assertRaises(KeyError):
+      self.cache.get(('seed_sample', 'A', '2'))
+
+  def test_lru_eviction(self):
+    self.cache.set('a', 1)
+    self.cache.set('b', 2)
+    self.cache.get('a')
+    self.cache.set('c', 3)
+    self.assertEqual(self.cache.get('a'), 1)
+    with self.assertRaises(KeyError):
+      self.cache.get('b')
+
+  @mock.patch('abq_data_entry.models.monotonic')
+  def test_expiry(self, mock_monotonic):
+    mock_monotonic.return_value = 100
+    self.cache.set('a', 1)
+    mock_monotonic.return_value = 105
+    self.assertEqual(self.cache.get('a'), 1)
+    mock_monotonic.return_value = 111
+    with self.assertRaises(KeyError):
+      self.cache.get('a')
+
+
+class TestStartupTracer(TestCase):
+
+  def test_write(self):
+    tracer = models.StartupTracer()
+    with tracer.phase('load settings'):
+      pass
+    self.assertEqual(tracer.phases[0][0], 'load settings')
+    file_open = mock.mock_open()
+    with mock.patch('abq_data_entry.models.open', file_open):
+      tracer.write('abq_startup.log')
+    file_open.assert_called_with('abq_startup.log', 'a', encoding='utf-8')
+    written = file_open().write.call_args[0][0]
+    self.assertIn('load settings', written)
+
+
+class TestSettingsModel(TestCase):
+
+  def setUp(self):
+    self.tempdir = tempfile.TemporaryDirectory()
+    config_dirs = {platform.system(): Path(self.tempdir.name)}
+    with mock.patch.object(models.SettingsModel, 'config_dirs', config_dirs):
+      self.model = models.SettingsModel()
+
+  def tearDown(self):
+    self.tempdir.cleanup()
+
+  def test_save_only_changes(self):
+    with mock.patch('abq_data_entry.models.os.replace') as replace:
+      self.model.save()
+      replace.assert_called_once()
+    with mock.patch('abq_data_entry.models.os.replace') as replace:
+      self.model.save()
+      replace.assert_not_called()
+
+  def test_save_replaces_file(self):
+    self.model.save()
+    self.assertTrue(self.model.filepath.exists())
+    self.assertEqual(list(Path(self.tempdir.name).glob('*.tmp')), [])
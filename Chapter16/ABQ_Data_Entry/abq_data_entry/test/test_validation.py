@@ -0,0 +1,101 @@
+from .. import validation
+from ..constants import FieldTypes as FT
+from unittest import TestCase
+
+
+class TestCheckFunctions(TestCase):
+
+  def test_check_required(self):
+    self.assertEqual(validation.check_required(''), 'A value is required')
+    self.assertEqual(validation.check_required(None), 'A value is required')
+    self.assertEqual(validation.check_required('  '), 'A value is required')
+    self.assertEqual(validation.check_required(0), '')
+
+  def test_check_date(self):
+    self.assertEqual(validation.check_date('2021-06-01'), '')
+    self.assertEqual(validation.check_date('2021-13-01'), 'Invalid date')
+
+  def test_check_number(self):
+    self.assertEqual(validation.check_number('5', -10, 10), '')
+    self.assertEqual(
+      validation.check_number('-a2-.3'), 'Invalid number string: -a2-.3'
+    )
+    self.assertEqual(
+      validation.check_number('-200', -10, 10), 'Value is too low (min -10)'
+    )
+    self.assertEqual(
+      validation.check_number(11, -10, 10), 'Value is too high (max 10)'
+    )
+    self.assertEqual(
+      validation.check_number('1.234', precision=-2),
+      'Too many decimal places'
+    )
+
+  def test_check_integer(self):
+    self.assertEqual(validation.check_integer('9', 0, 20), '')
+    self.assertEqual(
+      validation.check_integer('9.5', 0, 20), 'Invalid number string: 9.5'
+    )
+
+
+class TestRecordValidator(TestCase):
+
+  fields = {
+    "Date": {'req': True, 'type': FT.iso_date_string},
+    "Time": {'req': True, 'type': FT.string_list,
+             'values': ['8:00', '12:00', '16:00', '20:00']},
+    "Technician": {'req': True, 'type':  FT.string_list, 'values': []},
+    "Plot": {'req': True, 'type': FT.string_list,
+             'values': [str(x) for x in range(1, 21)]},
+    "Humidity": {'req': True, 'type': FT.decimal,
+                 'min': 0.5, 'max': 52.0, 'inc': .01},
+    "Equipment Fault": {'req': False, 'type': FT.boolean},
+    "Plants": {'req': True, 'type': FT.integer, 'min': 0, 'max': 20},
+    "Min Height": {'req': True, 'type': FT.decimal,
+                   'min': 0, 'max': 1000, 'inc': .01},
+    "Max Height": {'req': True, 'type': FT.decimal,
+                   'min': 0, 'max': 1000, 'inc': .01},
+    "Med Height": {'req': True, 'type': FT.decimal,
+                   'min': 0, 'max': 1000, 'inc': .01},
+    "Notes": {'req': False, 'type': FT.long_string}
+  }
+
+  record = {
+    'Date': '2021-06-01', 'Time': '8:00', 'Technician': 'J Simms',
+    'Plot': 2, 'Humidity': 24.47, 'Equipment Fault': False,
+    'Plants': 14, 'Min Height': 2.35, 'Max Height': 9.2,
+    'Med Height': 5.09, 'Notes': ''
+  }
+
+  def setUp(self):
+    self.validator = validation.RecordValidator(self.fields)
+
+  def test_valid_record(self):
+    self.assertEqual(self.validator.validate(self.record), {})
+
+  def test_field_errors(self):
+    record = dict(
+      self.record, Time='9:00', Humidity=60, Plants='', Plot='21'
+    )
+    errors = self.validator.validate(record)
+    self.assertEqual(
+      set(errors), {'Time', 'Humidity', 'Plants', 'Plot'}
+    )
+    self.assertEqual(errors['Plants'], 'A value is required')
+    self.assertEqual(errors['Humidity'], 'Value is too high (max 52.0)')
+
+  def test_equipment_fault(self):
+    record = dict(self.record, Humidity=None)
+    self.assertIn('Humidity', self.validator.validate(record))
+    record['Equipment Fault'] = True
+    self.assertEqual(self.validator.validate(record), {})
+
+  def test_heights(self):
+    record = dict(self.record, **{'Med Height': 10})
+    errors = self.validator.validate(record)
+    self.assertEqual(errors, {'Med Height': 'Value is too high (max 9.2)'})
+
+  def test_validate_many(self):
+    records = [self.record, dict(self.record, Date='bad')] * 2
+    results = self.validator.validate_many(records)
+    self.assertEqual([index for index, _ in results], [1, 3])
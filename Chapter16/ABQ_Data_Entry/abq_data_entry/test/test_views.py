@@ -0,0 +1,288 @@
+from .. import views
+from unittest import TestCase
+from unittest.mock import Mock, patch
+from io import StringIO
+import re
+import tkinter as tk
+import numpy as np
+
+
+class FakeWidget:
+  """Stands in for a widget's after() timers"""
+
+  def __init__(self):
+    self.timers = dict()
+    self._next_id = 0
+
+  def after(self, ms, function, *args):
+    self._next_id += 1
+    self.timers[self._next_id] = (function, args)
+    return self._next_id
+
+  def after_cancel(self, timer_id):
+    del self.timers[timer_id]
+
+  def run_timers(self):
+    timers, self.timers = self.timers, dict()
+    for function, args in timers.values():
+      function(*args)
+
+
+class TestAutofillEngine(TestCase):
+
+  sheet = {
+    'lab_check': {'lab_tech': 'J Simms'},
+    'seed_samples': {'1': 'AX477'},
+    'recorded_plots': set()
+  }
+
+  def setUp(self):
+    self.widget = FakeWidget()
+    self.model = Mock()
+    self.model.get_current_seed_sample.side_effect = (
+      lambda lab, plot: f'{lab}{plot}'
+    )
+    self.model.get_lab_sheet.return_value = self.sheet
+    self.engine = views.AutofillEngine(self.widget, self.model)
+    # background calls wait until finish_calls() runs them
+    self.calls = list()
+    patcher = patch.object(
+      views.m.BackgroundCall, 'start', autospec=True,
+      side_effect=self.calls.append
+    )
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def finish_calls(self):
+    calls, self.calls[:] = list(self.calls), []
+    for call in calls:
+      call.run()
+    self.engine._check_queue()
+
+  def test_debounce(self):
+    callback = Mock()
+    self.engine.request(('seed_sample', 'A', '1'), callback)
+    self.engine.request(('seed_sample', 'A', '2'), callback)
+    self.assertEqual(len(self.widget.timers), 1)
+    self.widget.run_timers()
+    self.finish_calls()
+    self.model.get_current_seed_sample.assert_called_once_with('A', '2')
+    callback.assert_called_once_with('A2')
+
+  def test_stale_result_not_delivered(self):
+    stale, latest = Mock(), Mock()
+    self.engine.request(('seed_sample', 'A', '1'), stale)
+    self.widget.run_timers()
+    # the inputs change while the first lookup is running
+    self.engine.request(('seed_sample', 'A', '2'), latest)
+    self.finish_calls()
+    stale.assert_not_called()
+    # but the result is still cached for later
+    self.assertEqual(self.engine.cache.get(('seed_sample', 'A', '1')), 'A1')
+    self.widget.run_timers()
+    self.finish_calls()
+    latest.assert_called_once_with('A2')
+
+  def test_cached_value_not_fetched(self):
+    callback = Mock()
+    self.engine.cache.set(('seed_sample', 'A', '1'), 'cached')
+    self.engine.request(('seed_sample', 'A', '1'), callback)
+    self.widget.run_timers()
+    self.assertEqual(self.calls, [])
+    self.model.get_current_seed_sample.assert_not_called()
+    callback.assert_called_once_with('cached')
+
+  def test_waits_for_loading_sheet(self):
+    callback = Mock()
+    self.engine.prefetch_sheet('2021-06-01', '8:00', 'A')
+    self.engine.request(('lab_check', '2021-06-01', '8:00', 'A'), callback)
+    self.widget.run_timers()
+    # only the sheet is being fetched
+    self.assertEqual(len(self.calls), 1)
+    self.finish_calls()
+    self.model.get_lab_check.assert_not_called()
+    self.model.get_lab_sheet.assert_called_once_with('2021-06-01', '8:00', 'A')
+    callback.assert_called_once_with({'lab_tech': 'J Simms'})
+
+  def test_single_polling_loop(self):
+    # a lookup started while results are handled doesn't start
+    # a second loop checking the queue
+    self.model.get_lab_sheet.side_effect = IOError('offline')
+    self.model.get_lab_check.return_value = {'lab_tech': 'P Taylor'}
+    callback = Mock()
+    self.engine.prefetch_sheet('2021-06-01', '8:00', 'A')
+    self.engine.request(('lab_check', '2021-06-01', '8:00', 'A'), callback)
+    self.widget.run_timers()
+    self.calls.pop().run()
+    # the failed sheet sends the lab check lookup to the database
+    self.widget.run_timers()
+    self.assertEqual(len(self.calls), 1)
+    self.assertEqual(len(self.widget.timers), 1)
+    self.calls.pop().run()
+    self.widget.run_timers()
+    callback.assert_called_once_with({'lab_tech': 'P Taylor'})
+    self.assertEqual(self.widget.timers, dict())
+
+
+class TestRecordListFilters(TestCase):
+
+  def test_narrows(self):
+    narrows = views.RecordList.narrows
+    self.assertTrue(narrows({'lab': 'A'}, {}))
+    self.assertTrue(narrows({'lab': 'a', 'plot': '3'}, {'lab': 'A'}))
+    self.assertFalse(narrows({}, {'lab': 'A'}))
+    self.assertFalse(narrows({'lab': 'B'}, {'lab': 'A'}))
+
+  def test_narrows_dates(self):
+    narrows = views.RecordList.narrows
+    base = {'date_from': '2021-01-01', 'date_to': '2021-12-31'}
+    self.assertTrue(
+      narrows({'date_from': '2021-02-01', 'date_to': '2021-03-01'}, base)
+    )
+    self.assertFalse(narrows({'date_to': '2021-03-01'}, base))
+    self.assertFalse(
+      narrows({'date_from': '2021-02-01', 'date_to': '2022-01-01'}, base)
+    )
+
+  def date_filters(self, date_from, date_to=''):
+    recordlist = Mock()
+    recordlist._filter_vars = {
+      'date_from': Mock(), 'date_to': Mock()
+    }
+    recordlist._filter_vars['date_from'].get.return_value = date_from
+    recordlist._filter_vars['date_to'].get.return_value = date_to
+    return recordlist
+
+  def test_dates_normalized(self):
+    recordlist = self.date_filters('2021-6-1 ')
+    self.assertTrue(views.RecordList._check_date_filters(recordlist))
+    recordlist._filter_vars['date_from'].set.assert_called_with('2021-06-01')
+    recordlist._filter_vars['date_to'].set.assert_not_called()
+
+  def test_invalid_date(self):
+    recordlist = self.date_filters('2021-06-01', '2021-13-01')
+    recordlist._filter_inputs = {'date_to': Mock()}
+    self.assertFalse(views.RecordList._check_date_filters(recordlist))
+    recordlist._filter_error.set.assert_called_with('To: Invalid date')
+    recordlist._filter_inputs['date_to'].focus_set.assert_called()
+
+  def test_invalid_date_not_applied(self):
+    recordlist = Mock()
+    recordlist._check_date_filters.return_value = False
+    views.RecordList._on_filter(recordlist)
+    recordlist.refresh.assert_not_called()
+    recordlist.event_generate.assert_not_called()
+
+
+class TestDataRecordForm(TestCase):
+  """Form methods called on a mock in place of the widget"""
+
+  def setUp(self):
+    self.form = Mock(current_record=None)
+    self.form._vars = {
+      key: Mock() for key in ('Date', 'Time', 'Lab', 'Plot')
+    }
+
+  def set_key(self, date, time='8:00', lab='A', plot='3'):
+    for key, value in zip(('Date', 'Time', 'Lab', 'Plot'),
+                          (date, time, lab, plot)):
+      self.form._vars[key].get.return_value = value
+
+  def test_record_exists_lookup(self):
+    self.set_key('2021-06-01')
+    views.DataRecordForm._check_record_exists(self.form)
+    self.form.autofill.request.assert_called_once_with(
+      ('plot_check', '2021-06-01', '8:00', 'A', '3'),
+      self.form._show_record_exists
+    )
+
+  def test_record_exists_skips_partial_date(self):
+    self.set_key('2021-06')
+    views.DataRecordForm._check_record_exists(self.form)
+    self.form.autofill.request.assert_not_called()
+    self.form.autofill.cancel.assert_called_once_with('plot_check')
+
+  def test_has_changes(self):
+    form = views.DataRecordForm.__new__(views.DataRecordForm)
+    form._vars = self.form._vars
+    form._modified = False
+    form._filling = True
+    # autofilled and loaded values aren't changes
+    form._on_var_write()
+    self.assertFalse(form.has_changes())
+    form._filling = False
+    form._on_var_write()
+    self.assertTrue(form.has_changes())
+
+
+class TestLabSheetRows(TestCase):
+
+  @staticmethod
+  def row(text):
+    """A row whose Plants cell holds text which won't convert"""
+    var = Mock()
+    var.get.side_effect = tk.TclError(
+      f'expected floating-point number but got "{text}"'
+    )
+    var.cell.get.return_value = text
+    blank = Mock()
+    blank.get.return_value = ''
+    return {'Plants': var, 'Notes': blank}
+
+  def test_partial_number_is_started(self):
+    sheet = Mock(autofilled_fields=views.LabSheetView.autofilled_fields)
+    self.assertTrue(
+      views.LabSheetView._is_started(sheet, self.row('.'))
+    )
+
+
+class TestYieldChartView(TestCase):
+  """The chart drawn on an Agg canvas in place of the Tk one"""
+
+  def setUp(self):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    chart = views.YieldChartView.__new__(views.YieldChartView)
+    # at 72 dpi, display coordinates are SVG points
+    chart.figure = Figure(figsize=(6, 4), dpi=72)
+    chart.canvas_tkagg = FigureCanvasAgg(chart.figure)
+    chart.axes = chart.figure.add_subplot(1, 1, 1)
+    chart.scatters = dict()
+    chart.colors = dict()
+    chart._background = None
+    chart._drawing_background = False
+    chart.canvas_tkagg.mpl_connect('draw_event', chart._on_draw)
+    self.chart = chart
+
+  def saved_points(self):
+    """Save the figure as SVG and return the centres of its markers"""
+    svg = StringIO()
+    self.chart.figure.savefig(svg, format='svg')
+    collection = re.search(
+      r'<g id="PathCollection_1">(.*?)</g>', svg.getvalue(), re.S
+    ).group(1)
+    points = list()
+    for path in re.findall(r'<path d="([^"]*)"', collection):
+      numbers = [float(n) for n in re.findall(r'-?[\d.]+', path)]
+      xs, ys = numbers[0::2], numbers[1::2]
+      points.append(((min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2))
+    return points
+
+  def test_saved_figure_has_updated_offsets(self):
+    self.chart.set_groups({
+      'AX477': (np.array([1., 2.]), np.array([10., 20.]), np.array([4., 4.]))
+    })
+    # same limits, so the scatter is only blitted
+    new = (np.array([1.5, 2.]), np.array([12., 20.]), np.array([4., 4.]))
+    self.chart.set_groups({'AX477': new})
+    self.assertIsNotNone(self.chart._background)
+
+    points = self.saved_points()
+    expected = self.chart.axes.transData.transform(np.column_stack(new[:2]))
+    height = self.chart.figure.bbox.height
+    self.assertEqual(len(points), 2)
+    for (x, y), (ex, ey) in zip(points, expected):
+      self.assertAlmostEqual(x, ex, places=2)
+      self.assertAlmostEqual(y, height - ey, places=2)
+    # saving redrew the figure, so the background is stale
+    self.assertIsNone(self.chart._background)
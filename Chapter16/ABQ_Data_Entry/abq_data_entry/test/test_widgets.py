@@ -112,6 +112,23 @@ class TestValidatedMixin(TkTestCase):
     fake_focusout_invalid.assert_called_with(event='focusout')
 
 
+class TestPrefixIndex(TestCase):
+
+  def setUp(self):
+    self.index = widgets.PrefixIndex(
+      ['Bobby', 'alice', 'Bob', 'Carol', 'ALBERT']
+    )
+
+  def test_matches(self):
+    self.assertEqual(self.index.matches('al'), ['ALBERT', 'alice'])
+    self.assertEqual(self.index.matches('BOB'), ['Bob', 'Bobby'])
+    self.assertEqual(self.index.matches('x'), [])
+
+  def test_limit(self):
+    self.assertEqual(self.index.matches('', limit=2), ['ALBERT', 'alice'])
+    self.assertEqual(self.index.count('b'), 2)
+
+
 class TestValidatedSpinbox(TkTestCase):
 
   def setUp(self):
@@ -217,3 +234,31 @@ class TestValidatedSpinbox(TkTestCase):
 
     self.click_arrow(arrow='dec', times=1)
     self.assertEqual(self.vsb.get(), '5')
+
+
+class TestBoundText(TkTestCase):
+
+  def setUp(self):
+    self.var = tk.StringVar(value='Some notes')
+    self.text = widgets.BoundText(self.root, textvariable=self.var)
+
+  def tearDown(self):
+    self.text.destroy()
+
+  def test_set_content(self):
+    self.var.set('Some longer notes')
+    self.assertEqual(self.text.get('1.0', 'end-1c'), 'Some longer notes')
+    self.var.set('')
+    self.assertEqual(self.text.get('1.0', 'end-1c'), '')
+
+  def test_set_var(self):
+    self.text.insert('end', ' and more')
+    self.root.update()
+    # the variable is synced when it is read
+    self.assertEqual(self.var.get(), 'Some notes and more')
+
+  def test_changed_span(self):
+    span = widgets.BoundText._changed_span('abcdef', 'abXYef')
+    self.assertEqual(span, (2, 2))
+    span = widgets.BoundText._changed_span('aaa', 'aaaa')
+    self.assertEqual(span, (3, 0))
@@ -0,0 +1,178 @@
+"""Validation rules for ABQ Data Entry records
+
+The rules work on plain Python values, so they can check records
+without a Tk root, e.g. when importing a batch of records.  The
+input widgets use the same check functions for their focus-out
+validation.
+"""
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from .constants import FieldTypes as FT
+
+
+#####################
+# Check functions   #
+#####################
+
+# Each check returns an error message, or an empty string if valid
+
+def is_blank(value):
+  return value is None or (isinstance(value, str) and not value.strip())
+
+
+def check_required(value):
+  return 'A value is required' if is_blank(value) else ''
+
+
+def check_date(value):
+  try:
+    datetime.strptime(str(value), '%Y-%m-%d')
+  except ValueError:
+    return 'Invalid date'
+  return ''
+
+
+def check_number(value, minimum=None, maximum=None, precision=None):
+  """Check that value is a number within the bounds
+
+  precision is the exponent of the smallest allowed increment,
+  e.g. -2 for hundredths, as in ValidatedSpinbox.
+  """
+  try:
+    d_value = Decimal(str(value))
+  except InvalidOperation:
+    return f'Invalid number string: {value}'
+  if not d_value.is_finite():
+    return f'Invalid number string: {value}'
+  if minimum is not None and d_value < minimum:
+    return f'Value is too low (min {minimum})'
+  if maximum is not None and d_value > maximum:
+    return f'Value is too high (max {maximum})'
+  if precision is not None and d_value.as_tuple().exponent < precision:
+    return 'Too many decimal places'
+  return ''
+
+
+def check_integer(value, minimum=None, maximum=None):
+  if isinstance(value, bool):
+    return f'Invalid number string: {value}'
+  try:
+    int(str(value).strip())
+  except ValueError:
+    return f'Invalid number string: {value}'
+  return check_number(value, minimum, maximum)
+
+
+def check_choice(value, choices):
+  if str(value) not in choices:
+    return f'{value} is not a valid choice'
+  return ''
+
+
+def check_boolean(value):
+  if isinstance(value, bool):
+    return ''
+  if str(value).strip().lower() in ('true', 'false', 'yes', 'no', '1', '0'):
+    return ''
+  return f'Invalid true/false value: {value}'
+
+
+def precision_of(increment):
+  """Return the decimal exponent of an increment like .01"""
+  return Decimal(str(increment)).normalize().as_tuple().exponent
+
+
+########################
+# Compiled field rules #
+########################
+
+def compile_field(spec):
+  """Compile a field spec into a function of value -> error message"""
+  field_type = spec.get('type', FT.string)
+  required = spec.get('req', False)
+  minimum = Decimal(str(spec['min'])) if 'min' in spec else None
+  maximum = Decimal(str(spec['max'])) if 'max' in spec else None
+
+  if field_type == FT.iso_date_string:
+    check = check_date
+  elif field_type in (FT.string_list, FT.short_string_list):
+    choices = frozenset(str(x) for x in spec.get('values', []))
+    # an empty list means the choices aren't restricted
+    check = (lambda value: check_choice(value, choices)) if choices else None
+  elif field_type == FT.decimal:
+    precision = precision_of(spec['inc']) if 'inc' in spec else None
+    check = lambda value: check_number(value, minimum, maximum, precision)
+  elif field_type == FT.integer:
+    check = lambda value: check_integer(value, minimum, maximum)
+  elif field_type == FT.boolean:
+    check = check_boolean
+  else:
+    check = None
+
+  def rule(value):
+    if is_blank(value):
+      return 'A value is required' if required else ''
+    return check(value) if check else ''
+  return rule
+
+
+class RecordValidator:
+  """Validates whole records against a model's field specs
+
+  The field rules are compiled once, when the validator is created,
+  so create it after the model has loaded any lookup values.
+  """
+
+  # fields which are left blank when there is an equipment fault
+  fault_fields = ('Humidity', 'Light', 'Temperature')
+
+  def __init__(self, fields):
+    self.rules = {
+      name: compile_field(spec) for name, spec in fields.items()
+    }
+
+  def validate_field(self, name, value):
+    return self.rules[name](value)
+
+  def validate(self, record):
+    """Return a dict of field name: error for an invalid record"""
+    errors = dict()
+    fault = record.get('Equipment Fault')
+    fault = fault is True or str(fault).lower() in ('true', 'yes', '1')
+    for name, rule in self.rules.items():
+      value = record.get(name)
+      if fault and name in self.fault_fields and is_blank(value):
+        continue
+      error = rule(value)
+      if error:
+        errors[name] = error
+    errors.update(self._check_heights(record, errors))
+    return errors
+
+  @staticmethod
+  def _check_heights(record, errors):
+    """The median height must be between the minimum and maximum"""
+    names = ('Min Height', 'Med Height', 'Max Height')
+    if not all(name in record for name in names):
+      return {}
+    if any(name in errors or is_blank(record[name]) for name in names):
+      return {}
+    low, median, high = (Decimal(str(record[name])) for name in names)
+    if low > high:
+      return {'Max Height': f'Value is too low (min {low})'}
+    if median < low:
+      return {'Med Height': f'Value is too low (min {low})'}
+    if median > high:
+      return {'Med Height': f'Value is too high (max {high})'}
+    return {}
+
+  def validate_many(self, records):
+    """Return a list of (index, errors) for the invalid records"""
+    validate = self.validate
+    results = list()
+    for index, record in enumerate(records):
+      errors = validate(record)
+      if errors:
+        results.append((index, errors))
+    return results
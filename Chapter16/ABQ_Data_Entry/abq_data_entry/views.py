@@ -1,19 +1,173 @@
 import tkinter as tk
 from tkinter import ttk
-from tkinter.simpledialog import Dialog
 from datetime import datetime
+from queue import Queue
 from . import widgets as w
+from . import models as m
+from .validation import RecordValidator, check_date
 from .constants import FieldTypes as FT
 from . import images
+from .lazyimport import lazy_import
+
+# Only the charts need these, so import them on first use
+charts = lazy_import(__package__ + '.charts')
+np = lazy_import('numpy')
+
+class AutofillEngine:
+  """Debounced, cached lookups for autofilling the record form
+
+  Requests are keyed by a tuple of (lookup name, *arguments) and
+  are only run once their inputs stop changing for `delay` ms.
+  Cache misses are fetched from the model in a background thread.
+  Results for keys which are no longer the latest request for
+  that lookup are cached but not delivered.
+
+  A whole lab sheet can be prefetched, which fills the cache for
+  every plot in the lab check.  Lookups it will answer wait for
+  it instead of querying the database themselves.
+  """
+
+  delay = 150
+
+  def __init__(self, widget, model, cache=None):
+    self.widget = widget
+    self.cache = cache or m.LookupCache()
+    self.model = model
+    self.lookups = {
+      'seed_sample': model.get_current_seed_sample,
+      'lab_check': model.get_lab_check,
+      'plot_check': model.plot_check_exists,
+      'lab_sheet': model.get_lab_sheet
+    }
+    self._latest = dict()
+    self._sheets_loading = set()
+    self._waiting = dict()
+    self._timers = dict()
+    self._queue = Queue()
+    self._outstanding = 0
+    self._polling = False
+
+  def request(self, key, callback):
+    """Call callback with the lookup result for key once settled"""
+    name = key[0]
+    self._latest[name] = key
+    if name in self._timers:
+      self.widget.after_cancel(self._timers[name])
+    self._timers[name] = self.widget.after(
+      self.delay, self._lookup, key, callback
+    )
+
+  def cancel(self, name):
+    """Forget any outstanding request for the named lookup"""
+    self._latest.pop(name, None)
+    if name in self._timers:
+      self.widget.after_cancel(self._timers.pop(name))
+
+  def forget(self, key):
+    """Drop a cached value which is known to be out of date"""
+    self.cache.discard(key)
+
+  def record_saved(self, record):
+    """Update the cache to reflect a newly saved record"""
+    sheet = (record['Date'], record['Time'], record['Lab'])
+    self.cache.set(
+      ('lab_check', *sheet), {'lab_tech': record['Technician']}
+    )
+    self.cache.set(('plot_check', *sheet, str(record['Plot'])), True)
+    try:
+      lab_sheet = self.cache.get(('lab_sheet', *sheet))
+    except KeyError:
+      return
+    lab_sheet['lab_check'] = {'lab_tech': record['Technician']}
+    lab_sheet['recorded_plots'].add(str(record['Plot']))
+
+  def prefetch_sheet(self, date, time, lab):
+    """Load the lab sheet for date, time and lab into the cache"""
+    key = ('lab_sheet', date, time, lab)
+    if key in self._sheets_loading:
+      return
+    try:
+      self.cache.get(key)
+    except KeyError:
+      self._sheets_loading.add(key)
+      self._start(self._fetch, key, None)
+
+  def _covering_sheet(self, key):
+    """Return the sheet being loaded which will answer key, if any"""
+    for sheet in self._sheets_loading:
+      if key == sheet:
+        return sheet
+      if key[0] == 'seed_sample' and key[1] == sheet[3]:
+        return sheet
+      if key[0] in ('lab_check', 'plot_check') and key[1:4] == sheet[1:]:
+        return sheet
+    return None
+
+  def _lookup(self, key, callback):
+    self._timers.pop(key[0], None)
+    try:
+      value = self.cache.get(key)
+    except KeyError:
+      sheet = self._covering_sheet(key)
+      if sheet:
+        self._waiting.setdefault(sheet, []).append((key, callback))
+      else:
+        if key[0] == 'lab_sheet':
+          self._sheets_loading.add(key)
+        self._start(self._fetch, key, callback)
+    else:
+      callback(value)
+
+  def _start(self, function, *args):
+    m.BackgroundCall(self._queue, function, *args).start()
+    self._outstanding += 1
+    if not self._polling:
+      self._check_queue()
+
+  def _fetch(self, key, callback):
+    """Run in the worker thread"""
+    try:
+      value = self.lookups[key[0]](*key[1:])
+    except Exception as e:
+      value = e
+    return key, callback, value
+
+  def _store_sheet(self, key, sheet):
+    """Cache the lookups answered by sheet, then retry waiting lookups"""
+    self._sheets_loading.discard(key)
+    if not isinstance(sheet, Exception):
+      _, date, time, lab = key
+      self.cache.set(('lab_check', date, time, lab), sheet['lab_check'])
+      for plot, seed in sheet['seed_samples'].items():
+        self.cache.set(('seed_sample', lab, plot), seed)
+        self.cache.set(
+          ('plot_check', date, time, lab, plot),
+          plot in sheet['recorded_plots']
+        )
+      self.cache.set(key, sheet)
+    for waiting_key, callback in self._waiting.pop(key, []):
+      if self._latest.get(waiting_key[0]) == waiting_key:
+        self._lookup(waiting_key, callback)
+
+  def _check_queue(self):
+    # lookups started while results are handled join this loop
+    self._polling = True
+    while not self._queue.empty():
+      key, callback, value = self._queue.get().body
+      self._outstanding -= 1
+      if key[0] == 'lab_sheet':
+        self._store_sheet(key, value)
+      if isinstance(value, Exception):
+        # autofill is a convenience; leave the fields alone
+        continue
+      self.cache.set(key, value)
+      if callback and self._latest.get(key[0]) == key:
+        callback(value)
+    if self._outstanding:
+      self.widget.after(20, self._check_queue)
+    else:
+      self._polling = False
 
-# new ch15
-import matplotlib
-matplotlib.use('TkAgg')
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import (
-  FigureCanvasTkAgg,
-  NavigationToolbar2Tk
-)
 
 class DataRecordForm(tk.Frame):
   """The input form for our widgets"""
@@ -29,6 +183,35 @@ class DataRecordForm(tk.Frame):
     FT.boolean: tk.BooleanVar
   }
 
+  # Frame, label and button styles for each section
+  styles = {
+    'RecordInfo.TLabelframe': {
+      'background': 'khaki', 'padx': 10, 'pady': 10
+    },
+    'EnvironmentInfo.TLabelframe': {
+      'background': 'lightblue', 'padx': 10, 'pady': 10
+    },
+    'PlantInfo.TLabelframe': {
+      'background': 'lightgreen', 'padx': 10, 'pady': 10
+    },
+    # Style the label Element as well
+    'RecordInfo.TLabelframe.Label': {
+      'background': 'khaki', 'padx': 10, 'pady': 10
+    },
+    'EnvironmentInfo.TLabelframe.Label': {
+      'background': 'lightblue', 'padx': 10, 'pady': 10
+    },
+    'PlantInfo.TLabelframe.Label': {
+      'background': 'lightgreen', 'padx': 10, 'pady': 10
+    },
+    # Style for the form labels and buttons
+    'RecordInfo.TLabel': {'background': 'khaki'},
+    'RecordInfo.TRadiobutton': {'background': 'khaki'},
+    'EnvironmentInfo.TLabel': {'background': 'lightblue'},
+    'EnvironmentInfo.TCheckbutton': {'background': 'lightblue'},
+    'PlantInfo.TLabel': {'background': 'lightgreen'}
+  }
+
   def _add_frame(self, label, style='', cols=3):
     """Add a labelframe to the form"""
 
@@ -46,47 +229,11 @@ class DataRecordForm(tk.Frame):
     self.model= model
     self.settings = settings
     fields = self.model.fields
+    self.validator = RecordValidator(fields)
 
     # new for ch9
-    style = ttk.Style()
-
-    # Frame styles
-    style.configure(
-      'RecordInfo.TLabelframe',
-      background='khaki', padx=10, pady=10
-    )
-    style.configure(
-      'EnvironmentInfo.TLabelframe', background='lightblue',
-      padx=10, pady=10
-    )
-    style.configure(
-      'PlantInfo.TLabelframe',
-      background='lightgreen', padx=10, pady=10
-    )
-    # Style the label Element as well
-    style.configure(
-      'RecordInfo.TLabelframe.Label', background='khaki',
-      padx=10, pady=10
-    )
-    style.configure(
-      'EnvironmentInfo.TLabelframe.Label',
-      background='lightblue', padx=10, pady=10
-    )
-    style.configure(
-      'PlantInfo.TLabelframe.Label',
-      background='lightgreen', padx=10, pady=10
-    )
-
-    # Style for the form labels and buttons
-    style.configure('RecordInfo.TLabel', background='khaki')
-    style.configure('RecordInfo.TRadiobutton', background='khaki')
-    style.configure('EnvironmentInfo.TLabel', background='lightblue')
-    style.configure(
-      'EnvironmentInfo.TCheckbutton',
-      background='lightblue'
-    )
-    style.configure('PlantInfo.TLabel', background='lightgreen')
-
+    for name, options in self.styles.items():
+      w.define_style(self, name, configure=options)
 
     # Create a dict to keep track of input widgets
     self._vars = {
@@ -100,6 +247,12 @@ class DataRecordForm(tk.Frame):
     # new chapter 8
     # variable to track current record id
     self.current_record = None
+    # the error shown for a record put back after a failed save
+    self.save_error = ''
+    # set when the user changes a field; _filling is set while the
+    # form fills in fields itself
+    self._modified = False
+    self._filling = False
 
     # Label for displaying what record we're editing
     self.record_label = ttk.Label(self)
@@ -254,14 +407,14 @@ class DataRecordForm(tk.Frame):
     # buttons
     buttons = tk.Frame(self)
     buttons.grid(sticky=tk.W + tk.E, row=5)
-    self.save_button_logo = tk.PhotoImage(file=images.SAVE_ICON)
+    self.save_button_logo = images.get_image(self, images.SAVE_ICON)
     self.savebutton = ttk.Button(
       buttons, text="Save", command=self._on_save,
       image=self.save_button_logo, compound=tk.LEFT
     )
     self.savebutton.pack(side=tk.RIGHT)
 
-    self.reset_button_logo = tk.PhotoImage(file=images.RESET_ICON)
+    self.reset_button_logo = images.get_image(self, images.RESET_ICON)
     self.resetbutton = ttk.Button(
       buttons, text="Reset", command=self.reset,
       image=self.reset_button_logo, compound=tk.LEFT
@@ -270,6 +423,7 @@ class DataRecordForm(tk.Frame):
 
     # new for ch12
     # Triggers
+    self.autofill = AutofillEngine(self, self.model)
     for field in ('Lab', 'Plot'):
       self._vars[field].trace_add(
         'write', self._populate_current_seed_sample)
@@ -278,12 +432,31 @@ class DataRecordForm(tk.Frame):
       self._vars[field].trace_add(
         'write', self._populate_tech_for_lab_check)
 
+    for field in ('Date', 'Time', 'Lab', 'Plot'):
+      self._vars[field].trace_add('write', self._check_record_exists)
+
+    for var in self._vars.values():
+      var.trace_add('write', self._on_var_write)
+
     # default the form
     self.reset()
 
   def _on_save(self):
     self.event_generate('<<SaveRecord>>')
 
+  def _on_var_write(self, *_):
+    if not self._filling:
+      self._modified = True
+
+  def has_changes(self):
+    """Return True if the user changed a field since the last reset or load"""
+    try:
+      # reading the values syncs any edits a widget is holding back
+      self.get()
+    except tk.TclError:
+      return True
+    return self._modified
+
   @staticmethod
   def tclerror_is_blank_value(exception):
     blank_value_errors = (
@@ -312,7 +485,15 @@ class DataRecordForm(tk.Frame):
 
   def reset(self):
     """Resets the form entries"""
+    self._filling = True
+    try:
+      self._reset()
+    finally:
+      self._filling = False
+    self._modified = False
+    self.save_error = ''
 
+  def _reset(self):
     lab = self._vars['Lab'].get()
     time = self._vars['Time'].get()
     technician = self._vars['Technician'].get()
@@ -347,18 +528,24 @@ class DataRecordForm(tk.Frame):
       self._vars['Plot'].set(plot_values[next_plot_index])
       self._vars['Seed Sample'].label_widget.input.focus()
 
+  @staticmethod
+  def value_for_validation(var, widget):
+    """Get a variable's value, or its widget's text if it won't convert"""
+    try:
+      return var.get()
+    except tk.TclError:
+      return widget.get()
+
   def get_errors(self):
     """Get a list of field errors in the form"""
 
-    errors = dict()
+    data = {
+      key: self.value_for_validation(var, var.label_widget.input)
+      for key, var in self._vars.items()
+    }
+    errors = self.validator.validate(data)
     for key, var in self._vars.items():
-      inp = var.label_widget.input
-      error = var.label_widget.error
-
-      if hasattr(inp, 'trigger_focusout_validation'):
-        inp.trigger_focusout_validation()
-      if error.get():
-        errors[key] = error.get()
+      var.label_widget.error.set(errors.get(key, ''))
 
     return errors
 
@@ -373,12 +560,37 @@ class DataRecordForm(tk.Frame):
       date, time, lab, plot = rowkey
       title = f'Record for Lab {lab}, Plot {plot} at {date} {time}'
       self.record_label.config(text=title)
+      self._filling = True
+      try:
+        for key, var in self._vars.items():
+          var.set(data.get(key, ''))
+          try:
+            var.label_widget.input.trigger_focusout_validation()
+          except AttributeError:
+            pass
+      finally:
+        self._filling = False
+      self._modified = False
+      self.save_error = ''
+
+  def restore(self, rowkey, data, error=''):
+    """Put a record which could not be saved back into the form
+
+    The error stays in the record label until the form is reset
+    or another record is loaded.
+    """
+    self.current_record = rowkey
+    self.save_error = str(error)
+    self._filling = True
+    try:
       for key, var in self._vars.items():
-        var.set(data.get(key, ''))
-        try:
-          var.label_widget.input.trigger_focusout_validation()
-        except AttributeError:
-          pass
+        value = data.get(key)
+        var.set('' if value is None else value)
+    finally:
+      self._filling = False
+    self._modified = False
+    self.autofill.cancel('plot_check')
+    self.record_label.config(text=f'Record was not saved: {error}')
 
   # new for ch12
 
@@ -390,8 +602,12 @@ class DataRecordForm(tk.Frame):
     lab = self._vars['Lab'].get()
 
     if plot and lab:
-      seed = self.model.get_current_seed_sample(lab, plot)
-      self._vars['Seed Sample'].set(seed)
+      self.autofill.request(
+        ('seed_sample', lab, plot),
+        self._autofill_setter('Seed Sample')
+      )
+    else:
+      self.autofill.cancel('seed_sample')
 
   def _populate_tech_for_lab_check(self, *_):
     """Populate technician based on the current lab check"""
@@ -406,42 +622,372 @@ class DataRecordForm(tk.Frame):
     lab = self._vars['Lab'].get()
 
     if all([date, time, lab]):
-      check = self.model.get_lab_check(date, time, lab)
-      tech = check['lab_tech'] if check else ''
-      self._vars['Technician'].set(tech)
+      self.autofill.prefetch_sheet(date, time, lab)
+      self.autofill.request(
+        ('lab_check', date, time, lab),
+        self._autofill_setter(
+          'Technician', lambda check: check['lab_tech'] if check else ''
+        )
+      )
+    else:
+      self.autofill.cancel('lab_check')
+
+  def _check_record_exists(self, *_):
+    """Warn if a new record would duplicate an existing one"""
+    if self.current_record is not None:
+      return
+    values = [
+      self._vars[key].get() for key in ('Date', 'Time', 'Lab', 'Plot')
+    ]
+    try:
+      datetime.fromisoformat(values[0])
+    except ValueError:
+      values[0] = ''
+    if all(values):
+      self.autofill.request(
+        ('plot_check', *values), self._show_record_exists
+      )
+    else:
+      self.autofill.cancel('plot_check')
+      self._show_record_exists(False)
+
+  def _show_record_exists(self, exists):
+    if self.current_record is not None or self.save_error:
+      return
+    if exists:
+      date, time, lab, plot = (
+        self._vars[key].get() for key in ('Date', 'Time', 'Lab', 'Plot')
+      )
+      self.record_label.config(
+        text=f'A record already exists for Lab {lab}, '
+        f'Plot {plot} at {date} {time}'
+      )
+    else:
+      self.record_label.config(text='New Record')
+
+  def _autofill_setter(self, field, transform=None):
+    """Return a callback which autofills field with a lookup result
+
+    The field is left alone if the user edited it while the
+    lookup was pending.
+    """
+    var = self._vars[field]
+    original = var.get()
+
+    def callback(value):
+      if var.get() == original:
+        self._filling = True
+        try:
+          var.set(transform(value) if transform else value)
+        finally:
+          self._filling = False
+    return callback
+
+
+class LabSheetView(tk.Frame):
+  """A grid for entering every plot of one lab check at once"""
+
+  sheet_fields = (
+    'Seed Sample', 'Humidity', 'Light', 'Temperature', 'Equipment Fault',
+    'Plants', 'Blossoms', 'Fruit', 'Min Height', 'Max Height',
+    'Med Height', 'Notes'
+  )
+  environment_fields = ('Humidity', 'Light', 'Temperature')
+  # fields which are filled in automatically, and so don't
+  # mean that the technician has started on a plot
+  autofilled_fields = ('Seed Sample', 'Equipment Fault')
+  cell_widths = {'Seed Sample': 8, 'Notes': 24}
+  default_cell_width = 6
+
+  def __init__(self, parent, model, settings, autofill=None, **kwargs):
+    super().__init__(parent, **kwargs)
+    self.model = model
+    self.settings = settings
+    self.autofill = autofill or AutofillEngine(self, model)
+    fields = self.model.fields
+    self.validator = RecordValidator(fields)
+    self.columnconfigure(0, weight=1)
+
+    # The lab check the sheet is for
+    header = ttk.LabelFrame(self, text='Lab Check')
+    header.grid(row=0, column=0, sticky=tk.W + tk.E, padx=10)
+    self._header_vars = dict()
+    for column, key in enumerate(('Date', 'Time', 'Lab', 'Technician')):
+      var = tk.StringVar()
+      w.LabelInput(
+        header, key, field_spec=fields[key], var=var
+      ).grid(row=0, column=column)
+      header.columnconfigure(column, weight=1)
+      self._header_vars[key] = var
+    for key in ('Date', 'Time', 'Lab'):
+      self._header_vars[key].trace_add('write', self._load_sheet)
+
+    # The grid of plots
+    sheet = ttk.Frame(self)
+    sheet.grid(row=1, column=0, sticky=tk.W + tk.E, padx=10, pady=10)
+    ttk.Label(sheet, text='Plot').grid(row=0, column=0)
+    for column, key in enumerate(self.sheet_fields, 1):
+      ttk.Label(sheet, text=key).grid(row=0, column=column, padx=2)
+    self._rows = dict()
+    self._recorded_labels = dict()
+    for row, plot in enumerate(fields['Plot']['values'], 1):
+      self._rows[plot] = self._add_row(sheet, row, plot)
+
+    self.status = tk.StringVar()
+    ttk.Label(self, textvariable=self.status).grid(
+      row=2, column=0, sticky=tk.W, padx=10
+    )
+
+    buttons = tk.Frame(self)
+    buttons.grid(row=3, column=0, sticky=tk.W + tk.E, padx=10)
+    ttk.Button(
+      buttons, text='Save Sheet', command=self._on_save
+    ).pack(side=tk.RIGHT)
+    ttk.Button(
+      buttons, text='Reset', command=self.reset
+    ).pack(side=tk.RIGHT)
 
+    self.reset()
 
-class LoginDialog(Dialog):
-  """A dialog that asks for username and password"""
+  def _add_row(self, parent, row, plot):
+    """Create the input cells for one plot, return their variables"""
+    fields = self.model.fields
+    ttk.Label(parent, text=plot).grid(row=row, column=0)
+    # linked variables for the min/max/median height checks
+    min_height_var = tk.DoubleVar(value='-infinity')
+    max_height_var = tk.DoubleVar(value='infinity')
+    linked_args = {
+      'Min Height': {
+        'max_var': max_height_var, 'focus_update_var': min_height_var
+      },
+      'Max Height': {
+        'min_var': min_height_var, 'focus_update_var': max_height_var
+      },
+      'Med Height': {
+        'min_var': min_height_var, 'max_var': max_height_var
+      }
+    }
+    row_vars = dict()
+    for column, key in enumerate(self.sheet_fields, 1):
+      spec = fields[key]
+      var = DataRecordForm.var_types[spec['type']]()
+      input_class, input_args = w.input_for_field_spec(
+        spec,
+        # a full Text widget is too large for a grid cell
+        ttk.Entry if spec['type'] == FT.long_string else None,
+        linked_args.get(key)
+      )
+      if input_class is ttk.Checkbutton:
+        input_args['variable'] = var
+      else:
+        input_args['textvariable'] = var
+        input_args['width'] = self.cell_widths.get(
+          key, self.default_cell_width
+        )
+      var.cell = input_class(parent, **input_args)
+      var.cell.grid(row=row, column=column, padx=1, pady=1)
+      row_vars[key] = var
 
-  def __init__(self, parent, title, error=''):
+    fault = row_vars['Equipment Fault']
+    fault.trace_add(
+      'write', lambda *_: self._check_fault(row_vars)
+    )
+    self._recorded_labels[plot] = ttk.Label(parent)
+    self._recorded_labels[plot].grid(
+      row=row, column=len(self.sheet_fields) + 1
+    )
+    return row_vars
 
+  @staticmethod
+  def _check_fault(row_vars):
+    """Disable a row's environment cells during an equipment fault"""
+    fault = row_vars['Equipment Fault'].get()
+    for key in LabSheetView.environment_fields:
+      var = row_vars[key]
+      var.cell.configure(state=tk.DISABLED if fault else tk.NORMAL)
+      if fault:
+        var.set('')
+        var.cell.error.set('')
+
+  def _on_save(self):
+    self.event_generate('<<SaveLabSheet>>')
+
+  @staticmethod
+  def _get_var(var):
+    try:
+      return var.get()
+    except tk.TclError as e:
+      if DataRecordForm.tclerror_is_blank_value(e):
+        return None
+      raise e
+
+  def _is_started(self, row_vars):
+    """Return True if any measurement has been entered for the row"""
+    # a partly typed number such as "." counts, so it gets validated
+    return any(
+      DataRecordForm.value_for_validation(var, var.cell) not in (None, '')
+      for key, var in row_vars.items()
+      if key not in self.autofilled_fields
+    )
+
+  def _open_rows(self):
+    """Yield plot, variables for rows which can be entered"""
+    for plot, row_vars in self._rows.items():
+      if not self._recorded_labels[plot].cget('text'):
+        yield plot, row_vars
+
+  def get(self):
+    """Return a list of record dicts for the rows which were entered"""
+    header = {key: var.get() for key, var in self._header_vars.items()}
+    records = list()
+    for plot, row_vars in self._open_rows():
+      if not self._is_started(row_vars):
+        continue
+      record = dict(header, Plot=plot)
+      for key, var in row_vars.items():
+        record[key] = self._get_var(var)
+      records.append(record)
+    return records
+
+  def get_errors(self):
+    """Validate the entered rows and return a dict of errors"""
+    header = {
+      key: DataRecordForm.value_for_validation(var, var.label_widget.input)
+      for key, var in self._header_vars.items()
+    }
+    errors = dict()
+    for key, var in self._header_vars.items():
+      error = self.validator.validate_field(key, header[key])
+      var.label_widget.error.set(error)
+      if error:
+        errors[key] = error
+    for plot, row_vars in self._open_rows():
+      if not self._is_started(row_vars):
+        continue
+      record = dict(header, Plot=plot)
+      for key, var in row_vars.items():
+        record[key] = DataRecordForm.value_for_validation(var, var.cell)
+      row_errors = self.validator.validate(record)
+      for key, var in row_vars.items():
+        if hasattr(var.cell, 'error'):
+          var.cell.error.set(row_errors.get(key, ''))
+        if key in row_errors:
+          errors[f'Plot {plot} {key}'] = row_errors[key]
+    return errors
+
+  def reset(self):
+    """Clear the plot rows, keeping the lab check"""
+    if not self._header_vars['Date'].get():
+      self._header_vars['Date'].set(datetime.today().strftime('%Y-%m-%d'))
+    for row_vars in self._rows.values():
+      for var in row_vars.values():
+        var.set(False if isinstance(var, tk.BooleanVar) else '')
+        if hasattr(var.cell, 'error'):
+          var.cell.error.set('')
+    self.status.set('')
+    self._load_sheet()
+
+  def _load_sheet(self, *_):
+    """Fetch the lab sheet for the current date, time and lab"""
+    key = tuple(
+      self._header_vars[k].get() for k in ('Date', 'Time', 'Lab')
+    )
+    try:
+      datetime.fromisoformat(key[0])
+    except ValueError:
+      return
+    if all(key):
+      self.autofill.request(('lab_sheet', *key), self._fill_sheet)
+
+  def _fill_sheet(self, sheet):
+    """Autofill the sheet and lock the plots already recorded"""
+    tech = sheet['lab_check'].get('lab_tech')
+    if tech and not self._header_vars['Technician'].get():
+      self._header_vars['Technician'].set(tech)
+    for plot, row_vars in self._rows.items():
+      recorded = plot in sheet['recorded_plots']
+      self._recorded_labels[plot].configure(
+        text='Recorded' if recorded else ''
+      )
+      for var in row_vars.values():
+        var.cell.configure(state=tk.DISABLED if recorded else tk.NORMAL)
+      if not recorded:
+        self._check_fault(row_vars)
+      seed_var = row_vars['Seed Sample']
+      if not seed_var.get():
+        seed_var.set(sheet['seed_samples'].get(plot, ''))
+    self.status.set(
+      '{} of {} plots already recorded'.format(
+        len(sheet['recorded_plots']), len(self._rows)
+      )
+    )
+
+
+class PopupWindow(tk.Toplevel):
+  """A window which is hidden, not destroyed, when it is closed
+
+  Build the contents once and call show() whenever it's needed,
+  rather than building a new Toplevel each time.
+  """
+
+  def __init__(self, parent, title='', **kwargs):
+    super().__init__(parent, **kwargs)
+    self.withdraw()
+    self.title(title)
+    self.protocol('WM_DELETE_WINDOW', self.hide)
+
+  def show(self):
+    self.deiconify()
+    self.lift()
+    self.focus_set()
+
+  def set_message(self, text=''):
+    """Show text over the window contents, or hide it if text is empty"""
+    if not hasattr(self, '_message'):
+      self._message = ttk.Label(self, padding=20, font='TkHeadingFont')
+    if text:
+      self._message.configure(text=text)
+      self._message.place(relx=.5, rely=.5, anchor='center')
+      self._message.lift()
+    else:
+      self._message.place_forget()
+
+  def hide(self, *_):
+    self.withdraw()
+
+
+class LoginDialog(PopupWindow):
+  """A dialog that asks for username and password
+
+  The dialog is built once; each call to show() clears it (or
+  fills in the given username) and waits for the user.
+  """
+
+  def __init__(self, parent):
+    super().__init__(parent)
+    self.resizable(False, False)
+    self.result = None
     self._pw = tk.StringVar()
     self._user = tk.StringVar()
-    self._error = tk.StringVar(value=error)
-    super().__init__(parent, title=title)
-
-  def body(self, frame):
-    """Construct the interface and return the widget for initial focus
+    self._error = tk.StringVar()
+    self._done = tk.BooleanVar()
 
-    Overridden from Dialog
-    """
+    frame = ttk.Frame(self)
+    frame.pack(padx=5, pady=5)
     ttk.Label(frame, text='Login to ABQ').grid(row=0)
-
-    if self._error.get():
-      ttk.Label(frame, textvariable=self._error).grid(row=1)
-    user_inp = w.LabelInput(
+    self._error_label = ttk.Label(frame, textvariable=self._error)
+    self._error_label.grid(row=1)
+    self._user_inp = w.LabelInput(
       frame, 'User name:', input_class=w.RequiredEntry,
       var=self._user
     )
-    user_inp.grid()
-    w.LabelInput(
+    self._user_inp.grid()
+    self._pw_inp = w.LabelInput(
       frame, 'Password:', input_class=w.RequiredEntry,
       input_args={'show': '*'}, var=self._pw
-    ).grid()
-    return user_inp.input
+    )
+    self._pw_inp.grid()
 
-  def buttonbox(self):
     box = ttk.Frame(self)
     ttk.Button(
       box, text="Login", command=self.ok, default=tk.ACTIVE
@@ -451,11 +997,42 @@ class LoginDialog(Dialog):
     ).grid(row=0, column=1, padx=5, pady=5)
     self.bind("<Return>", self.ok)
     self.bind("<Escape>", self.cancel)
+    self.protocol('WM_DELETE_WINDOW', self.cancel)
     box.pack()
 
-
-  def apply(self):
+  def show(self, title, error='', username=''):
+    """Show the dialog and return (username, password) or None"""
+    self.title(title)
+    self._error.set(error)
+    if error:
+      self._error_label.grid()
+    else:
+      self._error_label.grid_remove()
+    self._user.set(username)
+    self._pw.set('')
+    for inp in (self._user_inp, self._pw_inp):
+      inp.input.error.set('')
+    self.result = None
+
+    # like simpledialog, only be transient to a visible parent
+    parent = self.master
+    self.transient(parent if parent.winfo_viewable() else '')
+    super().show()
+    self._user_inp.input.focus_set()
+    self.wait_visibility()
+    self.grab_set()
+    self.wait_variable(self._done)
+    self.grab_release()
+    self.hide()
+    return self.result
+
+  def ok(self, *_):
     self.result = (self._user.get(), self._pw.get())
+    self._done.set(True)
+
+  def cancel(self, *_):
+    self.result = None
+    self._done.set(True)
 
 
 class RecordList(tk.Frame):
@@ -468,27 +1045,59 @@ class RecordList(tk.Frame):
     'Lab': {'label': 'Lab', 'width': 40},
     'Plot': {'label': 'Plot', 'width': 80}
   }
+  key_columns = ('Date', 'Time', 'Lab', 'Plot')
   default_width = 100
   default_minwidth = 10
   default_anchor = tk.CENTER
+  # fraction of the list scrolled past before more rows are requested
+  load_more_threshold = 0.9
 
-  def __init__(self, parent, *args, **kwargs):
+  def __init__(self, parent, changes=None, *args, **kwargs):
     super().__init__(parent, *args, **kwargs)
-    self._inserted = list()
-    self._updated = list()
+    # the change tracker is normally shared with the application
+    self.changes = changes or m.ChangeTracker()
     self.columnconfigure(0, weight=1)
-    self.rowconfigure(0, weight=1)
+    self.rowconfigure(1, weight=1)
+
+    # Sorting and filtering state.
+    # loaded_filters are the filters the rows were fetched with;
+    # complete is True once every row matching them is loaded.
+    # Other filter changes are sent to the application.
+    self.index = m.RecordIndex()
+    self.loaded_filters = dict()
+    self.complete = True
+    # set while the application is fetching more rows
+    self.loading = False
+    self.sort_field = None
+    self.sort_reverse = False
+    self._filter_vars = {
+      name: tk.StringVar() for name in
+      ('lab', 'plot', 'date_from', 'date_to', 'seed_sample')
+    }
+    self._search_var = tk.StringVar()
+    self._filter_error = tk.StringVar()
+    # lab and plot choices seen in unfiltered loads
+    self._filter_values = {'lab': set(), 'plot': set()}
+    self._build_filter_bar()
 
     # New ch12
     self.iid_map = dict()
+    # reverse lookup and last-written values, used to reconcile rows
+    self.rowkey_map = dict()
+    self._row_values = dict()
 
     # create treeview
+    # The "Match" column is only displayed for search results
+    columns = list(self.column_defs.keys())[1:]
     self.treeview = ttk.Treeview(
       self,
-      columns=list(self.column_defs.keys())[1:],
+      columns=columns + ['Match'],
+      displaycolumns=columns,
       selectmode='browse'
     )
-    self.treeview.grid(row=0, column=0, sticky='NSEW')
+    self.treeview.heading('Match', text='Match', anchor=tk.W)
+    self.treeview.column('Match', anchor=tk.W, width=300, stretch=True)
+    self.treeview.grid(row=1, column=0, sticky='NSEW')
 
     # Configure treeview columns
     for name, definition in self.column_defs.items():
@@ -497,7 +1106,10 @@ class RecordList(tk.Frame):
       minwidth = definition.get('minwidth', self.default_minwidth)
       width = definition.get('width', self.default_width)
       stretch = definition.get('stretch', False)
-      self.treeview.heading(name, text=label, anchor=anchor)
+      self.treeview.heading(
+        name, text=label, anchor=anchor,
+        command=lambda name=name: self._on_sort(name)
+      )
       self.treeview.column(
         name, anchor=anchor, minwidth=minwidth,
         width=width, stretch=stretch
@@ -505,6 +1117,9 @@ class RecordList(tk.Frame):
 
     self.treeview.bind('<Double-1>', self._on_open_record)
     self.treeview.bind('<Return>', self._on_open_record)
+    # with shift, open the record in a second form
+    self.treeview.bind('<Shift-Double-1>', self._on_open_record_window)
+    self.treeview.bind('<Shift-Return>', self._on_open_record_window)
 
     # configure scrollbar for the treeview
     self.scrollbar = ttk.Scrollbar(
@@ -512,44 +1127,281 @@ class RecordList(tk.Frame):
       orient=tk.VERTICAL,
       command=self.treeview.yview
     )
-    self.treeview.configure(yscrollcommand=self.scrollbar.set)
-    self.scrollbar.grid(row=0, column=1, sticky='NSW')
+    self.treeview.configure(yscrollcommand=self._on_yscroll)
+    self.scrollbar.grid(row=1, column=1, sticky='NSW')
 
     # configure tagging
     self.treeview.tag_configure('inserted', background='lightgreen')
     self.treeview.tag_configure('updated', background='lightblue')
+    self.treeview.tag_configure('pending', foreground='grey')
+    self.treeview.tag_configure('failed', foreground='red')
 
     # For ch12, hide first column since row # is no longer meaningful
     self.treeview.config(show='headings')
 
-  # new for ch12
+  def _build_filter_bar(self):
+    """Create the row of filter inputs above the treeview"""
+    bar = ttk.Frame(self)
+    bar.grid(row=0, column=0, columnspan=2, sticky='EW')
+    self._filter_inputs = dict()
+    inputs = (
+      ('lab', 'Lab', ttk.Combobox, {'width': 4, 'state': 'readonly'}),
+      ('plot', 'Plot', ttk.Combobox, {'width': 4, 'state': 'readonly'}),
+      ('date_from', 'From', ttk.Entry, {'width': 11}),
+      ('date_to', 'To', ttk.Entry, {'width': 11}),
+      ('seed_sample', 'Seed Sample', ttk.Entry, {'width': 10})
+    )
+    for name, label, input_class, input_args in inputs:
+      ttk.Label(bar, text=label).pack(side=tk.LEFT, padx=(5, 2))
+      inp = input_class(
+        bar, textvariable=self._filter_vars[name], **input_args
+      )
+      inp.pack(side=tk.LEFT)
+      inp.bind('<Return>', self._on_filter)
+      inp.bind('<<ComboboxSelected>>', self._on_filter)
+      self._filter_inputs[name] = inp
+    error_style = w.define_style(
+      bar, 'Error.TLabel', configure={'foreground': 'darkred'}
+    )
+    ttk.Label(bar, textvariable=self._filter_error, style=error_style).pack(
+      side=tk.LEFT, padx=5
+    )
+    ttk.Button(bar, text='Clear', command=self.clear_filters).pack(
+      side=tk.RIGHT, padx=5
+    )
+    ttk.Button(bar, text='Filter', command=self._on_filter).pack(
+      side=tk.RIGHT
+    )
+    search = ttk.Entry(bar, textvariable=self._search_var, width=20)
+    search.bind('<Return>', self._on_search)
+    search.pack(side=tk.RIGHT, padx=5)
+    ttk.Label(bar, text='Search notes').pack(side=tk.RIGHT)
+
+  @property
+  def filters(self):
+    """The active filters as a dict of non-empty values"""
+    return {
+      name: var.get().strip()
+      for name, var in self._filter_vars.items()
+      if var.get().strip()
+    }
+
+  @property
+  def search_text(self):
+    return self._search_var.get().strip()
+
+  def clear_filters(self):
+    for var in self._filter_vars.values():
+      var.set('')
+    if self.searching:
+      self._search_var.set('')
+      self._on_search()
+    else:
+      self._on_filter()
+
+  def _on_search(self, *_):
+    self.event_generate('<<SearchRecords>>')
+
+  @property
+  def searching(self):
+    return 'Match' in self.treeview.cget('displaycolumns')
+
+  def show_search_results(self, rows):
+    """Display search results, with the matching text"""
+    columns = list(self.column_defs.keys())[1:]
+    self.treeview.configure(displaycolumns=columns + ['Match'])
+    # the results are all there is, so filter them locally
+    self.complete = True
+    self.populate(rows)
+
+  def end_search(self):
+    """Return to displaying the normal record list"""
+    columns = list(self.column_defs.keys())[1:]
+    self.treeview.configure(displaycolumns=columns)
+
+  @staticmethod
+  def narrows(filters, base):
+    """Return True if filters only match rows which base matches"""
+    for name, value in base.items():
+      new = filters.get(name, '')
+      if name == 'date_from':
+        if new < value:
+          return False
+      elif name == 'date_to':
+        if not new or new > value:
+          return False
+      elif m.RecordIndex.normalize(new) != m.RecordIndex.normalize(value):
+        return False
+    return True
+
+  def _check_date_filters(self):
+    """Rewrite the date filters in ISO format
+
+    Returns False, with an error shown, if either isn't a date.
+    """
+    self._filter_error.set('')
+    for name, label in (('date_from', 'From'), ('date_to', 'To')):
+      var = self._filter_vars[name]
+      value = var.get().strip()
+      if not value:
+        continue
+      error = check_date(value)
+      if error:
+        self._filter_error.set(f'{label}: {error}')
+        self._filter_inputs[name].focus_set()
+        return False
+      # strptime accepts e.g. 2021-6-1, which wouldn't compare
+      # correctly with the dates of the rows
+      var.set(datetime.strptime(value, '%Y-%m-%d').date().isoformat())
+    return True
+
+  def _on_filter(self, *_):
+    """Apply the filters to the loaded rows"""
+    if not self._check_date_filters():
+      return
+    self.refresh()
+    local = self.complete and self.narrows(self.filters, self.loaded_filters)
+    if not local:
+      # ask the application to filter the full data set
+      self.event_generate('<<FilterRecords>>')
+
+  def _on_sort(self, field):
+    """Sort by field, reversing the order on a repeated click"""
+    if self.sort_field == field:
+      self.sort_reverse = not self.sort_reverse
+    else:
+      self.sort_field, self.sort_reverse = field, False
+    for name, definition in self.column_defs.items():
+      label = definition.get('label', '')
+      if name == field:
+        label += ' ▼' if self.sort_reverse else ' ▲'
+      self.treeview.heading(name, text=label)
+    self.refresh()
+
+  def refresh(self):
+    """Redisplay the loaded rows with the current sort and filters"""
+    rows = self.index.query(
+      self.sort_field, self.sort_reverse, **self.filters
+    )
+    # rows still being saved, or which failed to save, are shown
+    # at the top
+    unsaved = self.changes.pending | self.changes.failed
+    if unsaved:
+      loaded = {
+        tuple(str(row[key]) for key in self.key_columns) for row in rows
+      }
+      pending = [
+        dict(zip(self.key_columns, rowkey))
+        for rowkey in sorted(unsaved - loaded)
+      ]
+      rows = pending + rows
+    self._display(rows)
+
+  def _on_yscroll(self, first, last):
+    """Update the scrollbar and request more rows near the bottom"""
+    self.scrollbar.set(first, last)
+    if (
+      not self.complete and not self.loading and
+      float(last) >= self.load_more_threshold
+    ):
+      self.loading = True
+      self.event_generate('<<LoadMoreRecords>>')
 
   # update for ch12
-  def populate(self, rows):
-    """Clear the treeview and write the supplied data rows to it."""
+  def populate(self, rows, filters=None):
+    """Load the rows and display them, sorted and filtered
+
+    filters are those the rows were fetched with, if any.
+    """
+    self.index = m.RecordIndex(rows)
+    self.loaded_filters = dict(filters or {})
+    self._update_filter_values()
+    self.refresh()
+
+  def append(self, rows):
+    """Add rows to those already loaded"""
+    self.index.extend(rows)
+    self._update_filter_values()
+    self.refresh()
+
+  def _update_filter_values(self):
+    """Offer the lab and plot values of the loaded rows as filters
+
+    Rows fetched with filters don't show every value, so values
+    are only forgotten after an unfiltered load.
+    """
+    for name, known in self._filter_values.items():
+      values = self.index.values(self.index.indexed_fields[name])
+      if not self.loaded_filters:
+        known.clear()
+      known.update(values)
+      self._filter_inputs[name].configure(
+        values=[''] + sorted(known, key=lambda x: (len(x), x))
+      )
 
-    for row in self.treeview.get_children():
-      self.treeview.delete(row)
+  def _display(self, rows):
+    """Reconcile the treeview with the supplied data rows.
 
-    self.iid_map.clear()
+    Rows already displayed are matched by rowkey, so only the
+    rows which were added, changed, moved or removed touch the
+    treeview.  Selection and scroll position are preserved.
+    """
+    selected = self.selected_id
+    first_load = not self.iid_map
+    scroll_position = self.treeview.yview()[0]
 
     cids = list(self.column_defs.keys())[1:]
+    wanted = list()
+    wanted_keys = set()
     for rowdata in rows:
-      values = [rowdata[key] for key in cids]
-      rowkey = tuple([str(v) for v in values])
-      if rowkey in self._inserted:
-        tag = 'inserted'
-      elif rowkey in self._updated:
-        tag = 'updated'
-      else:
-        tag = ''
-      # new ch12 -- save generated IID, assign to rowkey
-      iid = self.treeview.insert(
-        '', 'end', values=values, tag=tag)
-      self.iid_map[iid] = rowkey
-
-    if len(rows) > 0:
-      firstrow = self.treeview.identify_row(0)
+      values = [str(rowdata[key]) for key in cids]
+      rowkey = tuple(values)
+      if rowkey in wanted_keys:
+        continue
+      wanted_keys.add(rowkey)
+      tag = self.changes.tag_for(rowkey)
+      values.append(rowdata.get('Match') or '')
+      wanted.append((rowkey, values, tag))
+
+    # Remove rows which are no longer present
+    stale = [
+      iid for iid, rowkey in self.iid_map.items()
+      if rowkey not in wanted_keys
+    ]
+    if stale:
+      self.treeview.delete(*stale)
+      for iid in stale:
+        del self.iid_map[iid]
+        del self.rowkey_map[self._row_values.pop(iid)[0]]
+
+    # Insert or update the remaining rows, then put them all in
+    # order with a single call, rather than moving them one by one
+    ordered = list()
+    for rowkey, values, tag in wanted:
+      iid = self.rowkey_map.get(rowkey)
+      if iid is None:
+        # new ch12 -- save generated IID, assign to rowkey
+        iid = self.treeview.insert('', tk.END, values=values, tag=tag)
+        self.iid_map[iid] = rowkey
+        self.rowkey_map[rowkey] = iid
+        self._row_values[iid] = (rowkey, values, tag)
+      elif self._row_values[iid] != (rowkey, values, tag):
+        self.treeview.item(iid, values=values, tags=tag or ())
+        self._row_values[iid] = (rowkey, values, tag)
+      ordered.append(iid)
+    if tuple(ordered) != self.treeview.get_children():
+      self.treeview.set_children('', *ordered)
+
+    if not wanted:
+      return
+    if not first_load:
+      self.treeview.yview_moveto(scroll_position)
+    if selected in self.rowkey_map:
+      iid = self.rowkey_map[selected]
+      self.treeview.selection_set(iid)
+      self.treeview.focus(iid)
+    elif first_load or selected is not None:
+      firstrow = self.treeview.identify_row(0) or ordered[0]
       self.treeview.focus_set()
       self.treeview.selection_set(firstrow)
       self.treeview.focus(firstrow)
@@ -559,6 +1411,9 @@ class RecordList(tk.Frame):
     """Handle record open request"""
     self.event_generate('<<OpenRecord>>')
 
+  def _on_open_record_window(self, *_):
+    self.event_generate('<<OpenRecordInWindow>>')
+
   @property
   def selected_id(self):
     selection = self.treeview.selection()
@@ -566,22 +1421,40 @@ class RecordList(tk.Frame):
 
 
   def add_updated_row(self, row):
-    if row not in self._updated:
-      self._updated.append(row)
+    self.changes.add_updated(row)
 
   def add_inserted_row(self, row):
-    if row not in self._inserted:
-      self._inserted.append(row)
+    self.changes.add_inserted(row)
 
   def clear_tags(self):
-    self._inserted.clear()
-    self._updated.clear()
+    self.changes.clear()
+    self.apply_tags()
+
+  def apply_tags(self):
+    """Re-apply the change tags to every displayed row in bulk"""
+    tagged = {'inserted': [], 'updated': [], 'pending': [], 'failed': []}
+    for iid, (rowkey, values, tag) in self._row_values.items():
+      new_tag = self.changes.tag_for(rowkey)
+      self._row_values[iid] = (rowkey, values, new_tag)
+      if new_tag:
+        tagged[new_tag].append(iid)
+    # ttk's "tag add" and "tag remove" take a whole list of items,
+    # which is one Tcl call per tag instead of one per row
+    for tag, iids in tagged.items():
+      self.treeview.tk.call(self.treeview, 'tag', 'remove', tag)
+      if iids:
+        self.treeview.tk.call(self.treeview, 'tag', 'add', tag, iids)
 
 
 # New ch15
 
 class LineChartView(tk.Canvas):
-  """A generic view for plotting a line chart"""
+  """A generic view for plotting a line chart
+
+  The mouse wheel zooms the x axis around the pointer, dragging
+  pans, double-clicking resets the zoom, and hovering shows the
+  values nearest the pointer.
+  """
 
   margin = 20
   colors = [
@@ -589,83 +1462,228 @@ class LineChartView(tk.Canvas):
     'blue', 'purple', 'violet',
     # add more for more complex plots
   ]
+  # Lines are reduced to about points_per_pixel points per pixel
+  # of plot width before drawing, with the downsample method:
+  # 'lttb', 'minmax' or None to draw every point.
+  downsample = 'lttb'
+  points_per_pixel = 1
+  # each wheel step zooms by this factor
+  zoom_step = 1.25
 
   def __init__(
     self, parent, data, plot_size,
     x_field, y_field, plot_by_field
   ):
-    self.data = data
     self.x_field = x_field
     self.y_field = y_field
     self.plot_by_field = plot_by_field
 
     # calculate view size
-    self.plot_width, self.plot_height = plot_size
-    view_width = self.plot_width + (2 * self.margin)
-    view_height = self.plot_height + (2 * self.margin)
+    plot_width, plot_height = plot_size
+    view_width = plot_width + (2 * self.margin)
+    view_height = plot_height + (2 * self.margin)
 
     super().__init__(
-      parent, width=view_width,
-      height=view_height, background='lightgrey'
+      parent, width=view_width, height=view_height,
+      background='lightgrey', highlightthickness=0
     )
-    # Draw chart
-    self.origin = (self.margin, view_height - self.margin)
-    self.create_line(
-      self.origin, (self.margin, self.margin), width=2
+    # Draw chart; the items are positioned by _layout()
+    self.y_axis = self.create_line(0, 0, 0, 0, width=2)
+    self.x_axis = self.create_line(0, 0, 0, 0)
+    self.x_label = self.create_text(0, 0, text=x_field, anchor='n')
+    self.y_label = self.create_text(
+      0, 0, text=y_field, angle=90, anchor='s'
     )
-    self.create_line(
-      self.origin,
-      (view_width - self.margin, view_height - self.margin)
+    self.plot_area = tk.Canvas(
+      self, background='#555', highlightthickness=0
     )
-    self.create_text(
-      (view_width // 2, view_height - self.margin),
-      text=x_field, anchor='n'
+    self.plot_window = self.create_window(
+      0, 0, window=self.plot_area, anchor='sw'
     )
-    self.create_text(
-       (self.margin, view_height // 2),
-       text=y_field, angle=90, anchor='s'
+    self._layout(view_width, view_height)
+    self.bind('<Configure>', self._on_resize)
+    self._redraw_id = None
+    self._draw_id = None
+    self._drag_start = None
+
+    # zoom and pan
+    self.plot_area.bind('<MouseWheel>', self._on_wheel)
+    self.plot_area.bind('<Button-4>', self._on_wheel)
+    self.plot_area.bind('<Button-5>', self._on_wheel)
+    self.plot_area.bind('<ButtonPress-1>', self._on_drag_start)
+    self.plot_area.bind('<B1-Motion>', self._on_drag)
+    self.plot_area.bind('<Double-1>', self.reset_zoom)
+    self.plot_area.bind('<Motion>', self._on_hover)
+    self.plot_area.bind('<Leave>', self._clear_hover)
+
+    self.set_data(data)
+
+  def _layout(self, view_width, view_height):
+    """Position the axes and plot area for the view size"""
+    self.plot_width = max(view_width - (2 * self.margin), 1)
+    self.plot_height = max(view_height - (2 * self.margin), 1)
+    self.origin = (self.margin, view_height - self.margin)
+    self.coords(self.y_axis, *self.origin, self.margin, self.margin)
+    self.coords(
+      self.x_axis, *self.origin,
+      view_width - self.margin, view_height - self.margin
     )
-    self.plot_area = tk.Canvas(
-      self, background='#555',
-      width=self.plot_width, height=self.plot_height
+    self.coords(
+      self.x_label, view_width // 2, view_height - self.margin
     )
-    self.create_window(
-      self.origin, window=self.plot_area, anchor='sw'
+    self.coords(self.y_label, self.margin, view_height // 2)
+    self.coords(self.plot_window, *self.origin)
+    self.itemconfigure(
+      self.plot_window, width=self.plot_width, height=self.plot_height
     )
 
-    # Draw legend and lines
-    plot_names = sorted(set([
-        row[self.plot_by_field]
-        for row in self.data
-    ]))
+  def _on_resize(self, event):
+    size = (event.width - 2 * self.margin, event.height - 2 * self.margin)
+    if size != (self.plot_width, self.plot_height):
+      self._layout(event.width, event.height)
+      self.redraw()
 
-    color_map = list(zip(plot_names, self.colors))
+  def prepare_data(self, data):
+    """Group and summarize data for set_series()
 
-    for plot_name, color in color_map:
-      dataxy = [
-        (row[x_field], row[y_field])
-        for row in data
-        if row[plot_by_field] == plot_name
-      ]
-      self._plot_line(dataxy, color)
-
-    self._draw_legend(color_map)
+    This doesn't touch Tk, so it can run in a background thread.
+    """
+    return charts.prepare_series(
+      data, self.x_field, self.y_field, self.plot_by_field
+    )
 
+  def set_data(self, data):
+    """Replace the plotted lines and legend with ones for data"""
+    self.set_series(self.prepare_data(data))
 
-  def _plot_line(self, data, color):
-    """Plot a line described by data in the given color"""
+  def set_series(self, pyramids):
+    """Replace the plotted lines with series from prepare_data()
 
-    max_x = max([row[0] for row in data])
-    max_y = max([row[1] for row in data])
-    x_scale = self.plot_width / max_x
-    y_scale = self.plot_height / max_y
-    coords = [
-      (round(x * x_scale), self.plot_height - round(y * y_scale))
-      for x, y in data
-    ]
-    self.plot_area.create_line(
-      *coords, width=4, fill=color, smooth=True
+    The lines are drawn one per idle callback, so the first
+    appears without waiting for the rest.
+    """
+    self.pyramids = pyramids
+    self.series = {
+      plot_name: pyramid.levels[0]
+      for plot_name, pyramid in pyramids.items()
+    }
+    # Scale every line to the same bounds
+    self.bounds = self.view = charts.data_bounds(self.series)
+    self.plot_area.delete('all')
+    color_map = list(zip(self.series, self.colors))
+
+    self._lines = {
+      plot_name: self.plot_area.create_line(
+        0, 0, 0, 0, width=4, fill=color, smooth=True
+      )
+      for plot_name, color in color_map
+    }
+    self._draw_legend(color_map)
+    self._hover = self.plot_area.create_text(
+      0, 10, fill='white', anchor='ne'
+    )
+    self.plot_area.coords(self._hover, self.plot_width - 10, 10)
+    self._undrawn = list(self._lines)
+    self._draw_next_line()
+
+  def _draw_next_line(self):
+    self._draw_id = None
+    if self._undrawn:
+      plot_name = self._undrawn.pop(0)
+      self.plot_area.coords(
+        self._lines[plot_name], self._line_coords(plot_name)
+      )
+    if self._undrawn:
+      self._draw_id = self.after_idle(self._draw_next_line)
+
+  def redraw(self):
+    """Move the existing lines to fit the current plot size and view"""
+    self._redraw_id = None
+    if self._draw_id:
+      self.after_cancel(self._draw_id)
+      self._draw_id = None
+    self._undrawn = list()
+    for plot_name, line in self._lines.items():
+      self.plot_area.coords(line, self._line_coords(plot_name))
+    self.plot_area.coords(self._hover, self.plot_width - 10, 10)
+
+  def _schedule_redraw(self):
+    # coalesce bursts of wheel and motion events into one redraw
+    if self._redraw_id is None:
+      self._redraw_id = self.after_idle(self.redraw)
+
+  def _line_coords(self, plot_name):
+    """Return canvas coordinates for a series in the current view"""
+    points = self.plot_width * self.points_per_pixel
+    x0, x1 = self.view[:2]
+    x, y = self.pyramids[plot_name].window(x0, x1, points)
+    x, y = charts.downsample(x, y, points, self.downsample)
+    coords = charts.to_coords(
+      x, y, self.view, self.plot_width, self.plot_height
     )
+    # a line needs at least two points
+    if len(coords) == 2:
+      coords *= 2
+    return coords
+
+  def _x_at(self, pixel):
+    """Return the data x value at a pixel of the plot area"""
+    x0, x1 = self.view[:2]
+    return x0 + pixel * (x1 - x0) / self.plot_width
+
+  def zoom(self, factor, pixel):
+    """Zoom the x axis by factor, keeping the x at pixel in place"""
+    x0, x1 = self.view[:2]
+    full_x0, full_x1 = self.bounds[:2]
+    center = self._x_at(pixel)
+    # don't zoom out past the data, or in past 1/10000th of it
+    width = min((x1 - x0) * factor, full_x1 - full_x0)
+    width = max(width, (full_x1 - full_x0) / 10000)
+    x0 = center - (center - x0) * width / (x1 - x0)
+    self._set_x_view(x0, width)
+
+  def _set_x_view(self, x0, width):
+    full_x0, full_x1 = self.bounds[:2]
+    x0 = min(max(x0, full_x0), full_x1 - width)
+    self.view = (x0, x0 + width, *self.view[2:])
+    self._schedule_redraw()
+
+  def reset_zoom(self, *_):
+    self.view = self.bounds
+    self._schedule_redraw()
+
+  def _on_wheel(self, event):
+    if event.num == 4 or event.delta > 0:
+      self.zoom(1 / self.zoom_step, event.x)
+    elif event.num == 5 or event.delta < 0:
+      self.zoom(self.zoom_step, event.x)
+
+  def _on_drag_start(self, event):
+    self._drag_start = (event.x, self.view[0])
+
+  def _on_drag(self, event):
+    if self._drag_start is None:
+      return
+    start_pixel, start_x0 = self._drag_start
+    x0, x1 = self.view[:2]
+    shift = (start_pixel - event.x) * (x1 - x0) / self.plot_width
+    self._set_x_view(start_x0 + shift, x1 - x0)
+
+  def _on_hover(self, event):
+    """Show the values nearest the pointer"""
+    x_value = self._x_at(event.x)
+    values = list()
+    for plot_name in self._lines:
+      point = self.pyramids[plot_name].nearest(x_value)
+      if point:
+        values.append(f'{plot_name}: {point[1]:.2f}')
+    self.plot_area.itemconfigure(
+      self._hover,
+      text=f'{self.x_field} {x_value:.0f}  ' + '  '.join(values)
+    )
+
+  def _clear_hover(self, *_):
+    self.plot_area.itemconfigure(self._hover, text='')
 
   def _draw_legend(self, color_map):
     # determine legend
@@ -676,8 +1694,25 @@ class LineChartView(tk.Canvas):
 
 
 class YieldChartView(tk.Frame):
+  """A scatter chart with one series for each group in the data
+
+  set_data() updates the existing scatters in place.  If the axes
+  and legend don't change, only the scatters are redrawn, over a
+  saved copy of the background.  The scatters are only left out of
+  the figure while that copy is made, so saving the figure from the
+  toolbar still includes them.
+  """
 
   def __init__(self, parent, x_axis, y_axis, title):
+    # new ch15; matplotlib is slow to import, so wait until it's needed
+    import matplotlib
+    matplotlib.use('TkAgg')
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_tkagg import (
+      FigureCanvasTkAgg,
+      NavigationToolbar2Tk
+    )
+
     super().__init__(parent)
     self.figure = Figure(figsize=(6, 4), dpi=100)
     self.canvas_tkagg = FigureCanvasTkAgg(self.figure, master=self)
@@ -688,16 +1723,102 @@ class YieldChartView(tk.Frame):
     self.axes.set_xlabel(x_axis)
     self.axes.set_ylabel(y_axis)
     self.axes.set_title(title)
-    self.scatters = list()
-    self.scatter_labels = list()
-
-  def draw_scatter(self, data, color, label):
-    x, y, s = zip(*data)
-    s = [(x ** 2)//2 for x in s]
-    scatter = self.axes.scatter(
-      x, y, s,
-      c=color, label=label, alpha=0.5
-    )
-    self.scatters.append(scatter)
-    self.scatter_labels.append(label)
-    self.axes.legend(self.scatters, self.scatter_labels)
+    # group: PathCollection
+    self.scatters = dict()
+    # colors are assigned as groups first appear, so they stay put
+    self.colors = dict()
+    self._background = None
+    self._drawing_background = False
+    self.canvas_tkagg.mpl_connect('draw_event', self._on_draw)
+
+  def color_for(self, group):
+    if group not in self.colors:
+      from matplotlib import rcParams
+      cycle = rcParams['axes.prop_cycle'].by_key()['color']
+      self.colors[group] = cycle[len(self.colors) % len(cycle)]
+    return self.colors[group]
+
+  @staticmethod
+  def prepare_data(data, x_field, y_field, size_field, group_field):
+    """Group data for set_groups(); safe to run in a background thread"""
+    return charts.group_rows(
+      data, group_field, (x_field, y_field, size_field)
+    )
+
+  def set_data(self, data, x_field, y_field, size_field, group_field):
+    """Plot x_field against y_field, one scatter per group_field value"""
+    self.set_groups(
+      self.prepare_data(data, x_field, y_field, size_field, group_field)
+    )
+
+  def set_groups(self, groups):
+    """Plot groups of (x, y, size) arrays from prepare_data()"""
+    regroup = groups.keys() != self.scatters.keys()
+    for group in set(self.scatters) - set(groups):
+      self.scatters.pop(group).remove()
+
+    limits = (self.axes.get_xlim(), self.axes.get_ylim())
+    self.axes.ignore_existing_data_limits = True
+    for group, (x, y, size) in groups.items():
+      offsets = np.column_stack((x, y))
+      sizes = (size ** 2) // 2
+      scatter = self.scatters.get(group)
+      if scatter is None:
+        self.scatters[group] = self.axes.scatter(
+          x, y, sizes, color=self.color_for(group), label=group,
+          alpha=0.5
+        )
+      else:
+        scatter.set_offsets(offsets)
+        scatter.set_sizes(sizes)
+      self.axes.update_datalim(offsets)
+    self.axes.autoscale_view()
+
+    if regroup:
+      legend = self.axes.get_legend()
+      if legend:
+        legend.remove()
+      if self.scatters:
+        self.axes.legend(
+          list(self.scatters.values()), [str(g) for g in self.scatters]
+        )
+    if (
+      regroup or self._background is None or
+      limits != (self.axes.get_xlim(), self.axes.get_ylim())
+    ):
+      self._draw_background()
+    else:
+      self._blit()
+
+  def clear(self):
+    """Remove the scatters"""
+    self.set_groups(dict())
+
+  def _on_draw(self, event):
+    """Forget the background after any draw but our own
+
+    Resizing, panning or saving the figure may change it.
+    """
+    if not self._drawing_background:
+      self._background = None
+
+  def _draw_background(self):
+    """Draw the figure without the scatters and save it, then blit them"""
+    self._drawing_background = True
+    for scatter in self.scatters.values():
+      scatter.set_animated(True)
+    try:
+      self.canvas_tkagg.draw()
+      self._background = self.canvas_tkagg.copy_from_bbox(self.axes.bbox)
+    finally:
+      for scatter in self.scatters.values():
+        scatter.set_animated(False)
+      self._drawing_background = False
+    self._blit()
+
+  def _blit(self):
+    """Redraw only the scatters"""
+    self.canvas_tkagg.restore_region(self._background)
+    for scatter in self.scatters.values():
+      self.axes.draw_artist(scatter)
+    self.canvas_tkagg.blit(self.axes.bbox)
@@ -1,8 +1,34 @@
+import re
 import tkinter as tk
 from tkinter import ttk
-from datetime import datetime
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal
+from bisect import bisect_left
+from functools import lru_cache
 from .constants import FieldTypes as FT
+from . import validation
+
+
+##################
+# Style Registry #
+##################
+
+def define_style(widget, name, configure=None, map=None):
+  """Define a ttk style once per Tk interpreter, and return its name
+
+  Styles are shared by every widget in the interpreter, so there is
+  no need to send the same configuration to Tcl for each widget.
+  The names already defined are recorded on the root window.
+  """
+  root = widget._root()
+  defined = root.__dict__.setdefault('_defined_styles', set())
+  if name not in defined:
+    style = ttk.Style(root)
+    if configure:
+      style.configure(name, **configure)
+    if map:
+      style.map(name, **map)
+    defined.add(name)
+  return name
 
 
 ##################
@@ -12,6 +38,11 @@ from .constants import FieldTypes as FT
 class ValidatedMixin:
   """Adds a validation functionality to an input widget"""
 
+  validated_style_map = {
+    'foreground': [('invalid', 'white'), ('!invalid', 'black')],
+    'fieldbackground': [('invalid', 'darkred'), ('!invalid', 'white')]
+  }
+
   def __init__(self, *args, error_var=None, **kwargs):
     self.error = error_var or tk.StringVar()
     super().__init__(*args, **kwargs)
@@ -19,13 +50,9 @@ class ValidatedMixin:
     vcmd = self.register(self._validate)
     invcmd = self.register(self._invalid)
 
-    style = ttk.Style()
-    widget_class = self.winfo_class()
-    validated_style = 'ValidatedInput.' + widget_class
-    style.map(
-      validated_style,
-      foreground=[('invalid', 'white'), ('!invalid', 'black')],
-      fieldbackground=[('invalid', 'darkred'), ('!invalid', 'white')]
+    validated_style = define_style(
+      self, 'ValidatedInput.' + self.winfo_class(),
+      map=self.validated_style_map
     )
     self.configure(style=validated_style)
 
@@ -114,29 +141,83 @@ class DateEntry(ValidatedMixin, ttk.Entry):
     return valid
 
   def _focusout_validate(self, event):
-    valid = True
-    if not self.get():
-      self.error.set('A value is required')
-      valid = False
-    try:
-      datetime.strptime(self.get(), '%Y-%m-%d')
-    except ValueError:
-      self.error.set('Invalid date')
-      valid = False
-    return valid
+    value = self.get()
+    error = validation.check_required(value) or validation.check_date(value)
+    self.error.set(error)
+    return not error
 
 
 class RequiredEntry(ValidatedMixin, ttk.Entry):
 
   def _focusout_validate(self, event):
-    valid = True
-    if not self.get():
-      valid = False
-      self.error.set('A value is required')
-    return valid
+    error = validation.check_required(self.get())
+    self.error.set(error)
+    return not error
+
+
+class PrefixIndex:
+  """A sorted, case-insensitive index of values for prefix matching
+
+  Matches are ranked alphabetically, so an exact match comes before
+  the longer values that start with it.
+  """
+
+  def __init__(self, values=()):
+    self.values = tuple(str(x) for x in values)
+    entries = sorted(
+      (value.casefold(), position)
+      for position, value in enumerate(self.values)
+    )
+    self._keys = [key for key, _ in entries]
+    self._positions = [position for _, position in entries]
+
+  def _bounds(self, prefix):
+    prefix = prefix.casefold()
+    start = bisect_left(self._keys, prefix)
+    end = bisect_left(self._keys, prefix + '\U0010ffff', start)
+    return start, end
+
+  def count(self, prefix):
+    start, end = self._bounds(prefix)
+    return end - start
+
+  def matches(self, prefix, limit=None):
+    """Return the values starting with prefix, at most limit of them"""
+    start, end = self._bounds(prefix)
+    if limit is not None:
+      end = min(end, start + limit)
+    return [self.values[p] for p in self._positions[start:end]]
 
 
 class ValidatedCombobox(ValidatedMixin, ttk.Combobox):
+  """A combobox which autocompletes its values
+
+  The values are indexed whenever they are configured, so a
+  keystroke doesn't have to scan the whole list.  If suggest is
+  set, the dropdown lists at most that many of the values matching
+  the text typed so far.
+  """
+
+  def __init__(self, *args, suggest=0, **kwargs):
+    self.suggest = suggest
+    self.index = PrefixIndex()
+    super().__init__(*args, **kwargs)
+    self.index = PrefixIndex(self.cget('values'))
+    if suggest:
+      self.bind('<FocusOut>', self._show_all_values, add='+')
+
+  def configure(self, cnf=None, **kwargs):
+    options = dict(cnf, **kwargs) if isinstance(cnf, dict) else kwargs
+    result = super().configure(cnf, **kwargs)
+    if 'values' in options:
+      self.index = PrefixIndex(self.cget('values'))
+    return result
+
+  config = configure
+
+  def _show_all_values(self, *_):
+    # bypass our configure, the index already has every value
+    super().configure(values=self.index.values)
 
   def _key_validate(self, proposed, action, **kwargs):
     valid = True
@@ -144,40 +225,54 @@ class ValidatedCombobox(ValidatedMixin, ttk.Combobox):
     # just clear the field
     if action == '0':
       self.set('')
+      if self.suggest:
+        self._show_all_values()
       return True
 
-    # get our values list
-    values = self.cget('values')
     # Do a case-insensitve match against the entered text
-    matching = [
-      x for x in values
-      if x.lower().startswith(proposed.lower())
-    ]
+    matching = self.index.matches(proposed, max(self.suggest, 2))
     if len(matching) == 0:
       valid = False
     elif len(matching) == 1:
       self.set(matching[0])
       self.icursor(tk.END)
       valid = False
+    elif self.suggest:
+      super().configure(values=matching)
     return valid
 
   def _focusout_validate(self, **kwargs):
-    valid = True
-    if not self.get():
-      valid = False
-      self.error.set('A value is required')
-    return valid
+    error = validation.check_required(self.get())
+    self.error.set(error)
+    return not error
+
+
+@lru_cache()
+def number_format(negative, precision):
+  """Return a regex matching partly typed numbers
+
+  negative allows a leading minus sign, and precision is the
+  exponent of the smallest increment, as in ValidatedSpinbox.
+  """
+  sign = '-?' if negative else ''
+  decimals = r'(\.\d{0,%d})?' % -precision if precision < 0 else ''
+  return re.compile(sign + r'\d*' + decimals)
 
 
 class ValidatedSpinbox(ValidatedMixin, ttk.Spinbox):
-  """A Spinbox that only accepts Numbers"""
+  """A Spinbox that only accepts Numbers
+
+  The bounds are cached when they are configured, so keystroke
+  validation doesn't need to query Tcl.
+  """
 
   def __init__(self, *args, min_var=None, max_var=None,
     focus_update_var=None, from_='-Infinity', to='Infinity', **kwargs
    ):
-    super().__init__(*args, from_=from_, to=to, **kwargs)
     increment = Decimal(str(kwargs.get('increment', '1.0')))
     self.precision = increment.normalize().as_tuple().exponent
+    super().__init__(*args, from_=from_, to=to, **kwargs)
+    self._cache_bounds()
     # there should always be a variable,
     # or some of our code will fail
     self.variable = kwargs.get('textvariable')
@@ -194,94 +289,69 @@ class ValidatedSpinbox(ValidatedMixin, ttk.Spinbox):
     self.focus_update_var = focus_update_var
     self.bind('<FocusOut>', self._set_focus_update_var)
 
+  def configure(self, cnf=None, **kwargs):
+    options = dict(cnf, **kwargs) if isinstance(cnf, dict) else kwargs
+    result = super().configure(cnf, **kwargs)
+    if {'from', 'from_', 'to'} & options.keys():
+      self._cache_bounds()
+    return result
+
+  config = configure
+
+  def _cache_bounds(self):
+    self.minimum = float(self.cget('from'))
+    self.maximum = float(self.cget('to'))
+    self._number_format = number_format(self.minimum < 0, self.precision)
+
   def _set_focus_update_var(self, event):
     value = self.get()
     if self.focus_update_var and not self.error.get():
       self.focus_update_var.set(value)
 
-  def _set_minimum(self, *_):
-    current = self.get()
+  def _set_bound(self, option, var, current_bound):
     try:
-      new_min = self.min_var.get()
-      self.config(from_=new_min)
+      new_bound = var.get()
+      # Only revalidate if the bound actually moved
+      if float(new_bound) == current_bound:
+        return
     except (tk.TclError, ValueError):
-      pass
+      return
+    current = self.get()
+    self.configure({option: new_bound})
     if not current:
       self.delete(0, tk.END)
     else:
       self.variable.set(current)
     self.trigger_focusout_validation()
 
+  def _set_minimum(self, *_):
+    self._set_bound('from', self.min_var, self.minimum)
+
   def _set_maximum(self, *_):
-    current = self.get()
-    try:
-      new_max = self.max_var.get()
-      self.config(to=new_max)
-    except (tk.TclError, ValueError):
-      pass
-    if not current:
-      self.delete(0, tk.END)
-    else:
-      self.variable.set(current)
-    self.trigger_focusout_validation()
+    self._set_bound('to', self.max_var, self.maximum)
 
   def _key_validate(
     self, char, index, current, proposed, action, **kwargs
   ):
     if action == '0':
       return True
-    valid = True
-    min_val = self.cget('from')
-    max_val = self.cget('to')
-    no_negative = min_val >= 0
-    no_decimal = self.precision >= 0
-
-    # First, filter out obviously invalid keystrokes
-    if any([
-        (char not in '-1234567890.'),
-        (char == '-' and (no_negative or index != '0')),
-        (char == '.' and (no_decimal or '.' in current))
-    ]):
+
+    # The format checks the sign and the number of decimal places
+    if not self._number_format.fullmatch(proposed):
       return False
 
     # At this point, proposed is either '-', '.', '-.',
-    # or a valid Decimal string
+    # or a valid number string
     if proposed in '-.':
       return True
-
-    # Proposed is a valid Decimal string
-    # convert to Decimal and check more:
-    proposed = Decimal(proposed)
-    proposed_precision = proposed.as_tuple().exponent
-
-    if any([
-      (proposed > max_val),
-      (proposed_precision < self.precision)
-    ]):
-      return False
-
-    return valid
+    return float(proposed) <= self.maximum
 
   def _focusout_validate(self, **kwargs):
-    valid = True
-    value = self.get()
-    min_val = self.cget('from')
-    max_val = self.cget('to')
-
-    try:
-      d_value = Decimal(value)
-    except InvalidOperation:
-      self.error.set(f'Invalid number string: {value}')
-      return False
-
-    if d_value < min_val:
-      self.error.set(f'Value is too low (min {min_val})')
-      valid = False
-    if d_value > max_val:
-      self.error.set(f'Value is too high (max {max_val})')
-      valid = False
-
-    return valid
+    error = validation.check_number(
+      self.get(), self.minimum, self.maximum
+    )
+    self.error.set(error)
+    return not error
 
 class ValidatedRadioGroup(ttk.Frame):
   """A validated radio button group"""
@@ -310,28 +380,110 @@ class ValidatedRadioGroup(ttk.Frame):
 
 
 class BoundText(tk.Text):
-  """A Text widget with a bound variable."""
+  """A Text widget with a bound variable.
+
+  The variable is updated lazily: when it is read, when the widget
+  loses focus, or shortly after typing stops.  Changes made to the
+  variable are applied to the text as a single edit.
+  """
+
+  # ms to wait after a modification before updating the variable
+  sync_delay = 500
 
   def __init__(self, *args, textvariable=None, **kwargs):
     super().__init__(*args, **kwargs)
     self._variable = textvariable
+    self._sync_id = None
+    self._syncing = False
+    self._traces = list()
     if self._variable:
       # insert any default value
       self.insert('1.0', self._variable.get())
-      self._variable.trace_add('write', self._set_content)
-      self.bind('<<Modified>>', self._set_var)
+      self.edit_modified(False)
+      for mode, callback in (
+        ('write', self._set_content), ('read', self._set_var)
+      ):
+        cbname = self._variable.trace_add(mode, callback)
+        self._traces.append((mode, cbname))
+      self.bind('<<Modified>>', self._schedule_sync)
+      self.bind('<FocusOut>', self._set_var, add='+')
+
+  def _schedule_sync(self, *_):
+    # the modified flag stays set until we sync,
+    # so this only runs once per sync
+    if self.edit_modified() and self._sync_id is None:
+      self._sync_id = self.after(self.sync_delay, self._set_var)
 
   def _set_var(self, *_):
     """Set the variable to the text contents"""
-    if self.edit_modified():
-      content = self.get('1.0', 'end-1chars')
-      self._variable.set(content)
+    if self._sync_id is not None:
+      self.after_cancel(self._sync_id)
+      self._sync_id = None
+    if self._syncing or not self.edit_modified():
+      return
+    self._syncing = True
+    try:
+      self._variable.set(self.get('1.0', 'end-1chars'))
       self.edit_modified(False)
+    finally:
+      self._syncing = False
+
+  @staticmethod
+  def _changed_span(old, new):
+    """Return the length of the common prefix and suffix of two strings"""
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+      prefix += 1
+    suffix = 0
+    while (
+      suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]
+    ):
+      suffix += 1
+    return prefix, suffix
 
   def _set_content(self, *_):
     """Set the text contents to the variable"""
-    self.delete('1.0', tk.END)
-    self.insert('1.0', self._variable.get())
+    if self._syncing:
+      return
+    self._syncing = True
+    try:
+      old = self.get('1.0', 'end-1chars')
+      new = self._variable.get()
+      if old != new:
+        prefix, suffix = self._changed_span(old, new)
+        start = f'1.0 + {prefix} chars'
+        self.delete(start, f'1.0 + {len(old) - suffix} chars')
+        self.insert(start, new[prefix:len(new) - suffix])
+      self.edit_modified(False)
+    finally:
+      self._syncing = False
+
+  def destroy(self):
+    if self._variable:
+      self._set_var()
+      for mode, cbname in self._traces:
+        self._variable.trace_remove(mode, cbname)
+      self._traces.clear()
+    super().destroy()
+
+
+def input_for_field_spec(field_spec, input_class=None, input_args=None):
+  """Return the input class and input arguments for a field spec"""
+  input_args = dict(input_args or {})
+  field_type = field_spec.get('type', FT.string)
+  input_class = input_class or LabelInput.field_types.get(field_type)
+  # min, max, increment
+  if 'min' in field_spec and 'from_' not in input_args:
+    input_args['from_'] = field_spec.get('min')
+  if 'max' in field_spec and 'to' not in input_args:
+    input_args['to'] = field_spec.get('max')
+  if 'inc' in field_spec and 'increment' not in input_args:
+    input_args['increment'] = field_spec.get('inc')
+    # values
+  if 'values' in field_spec and 'values' not in input_args:
+    input_args['values'] = field_spec.get('values')
+  return input_class, input_args
 
 
 ###########################
@@ -366,18 +518,9 @@ class LabelInput(ttk.Frame):
 
     # Process the field spec to determine input_class and validation
     if field_spec:
-      field_type = field_spec.get('type', FT.string)
-      input_class = input_class or self.field_types.get(field_type)
-      # min, max, increment
-      if 'min' in field_spec and 'from_' not in input_args:
-        input_args['from_'] = field_spec.get('min')
-      if 'max' in field_spec and 'to' not in input_args:
-        input_args['to'] = field_spec.get('max')
-      if 'inc' in field_spec and 'increment' not in input_args:
-        input_args['increment'] = field_spec.get('inc')
-        # values
-      if 'values' in field_spec and 'values' not in input_args:
-        input_args['values'] = field_spec.get('values')
+      input_class, input_args = input_for_field_spec(
+        field_spec, input_class, input_args
+      )
 
     # setup the label
     if input_class in (ttk.Checkbutton, ttk.Button):
@@ -413,8 +556,10 @@ class LabelInput(ttk.Frame):
     self.columnconfigure(0, weight=1)
 
     # Set up error handling & display
-    error_style = 'Error.' + label_args.get('style', 'TLabel')
-    ttk.Style().configure(error_style, foreground='darkred')
+    error_style = define_style(
+      self, 'Error.' + label_args.get('style', 'TLabel'),
+      configure={'foreground': 'darkred'}
+    )
     self.error = getattr(self.input, 'error', tk.StringVar())
     ttk.Label(self, textvariable=self.error, style=error_style).grid(
         row=2, column=0, sticky=(tk.W + tk.E)
@@ -0,0 +1,79 @@
+"""Time how long the data record form and login dialog take to build
+
+Run from the ABQ_Data_Entry directory::
+
+  python3 -m benchmarks.form_construction [repeat]
+
+The first build defines the ttk styles; later builds should reuse
+them, so the first build is reported separately.
+"""
+import sys
+import tkinter as tk
+from time import perf_counter
+
+from abq_data_entry import views as v
+from abq_data_entry.models import CSVModel
+
+
+class BenchmarkModel:
+  """Just enough of a model to build the form
+
+  The form's autofill engine looks these up, so they return
+  nothing rather than touching a database.
+  """
+
+  fields = CSVModel.fields
+
+  def get_current_seed_sample(self, lab, plot):
+    return ''
+
+  def get_lab_check(self, date, time, lab):
+    return None
+
+  def plot_check_exists(self, date, time, lab, plot):
+    return False
+
+  def get_lab_sheet(self, date, time, lab):
+    return {'lab_check': None, 'seed_samples': {}, 'recorded_plots': set()}
+
+
+def time_call(function, repeat):
+  """Return the first and the mean of the remaining run times in ms"""
+  times = list()
+  for _ in range(repeat):
+    start = perf_counter()
+    function()
+    times.append((perf_counter() - start) * 1000)
+  rest = times[1:] or times
+  return times[0], sum(rest) / len(rest)
+
+
+def main(repeat=20):
+  root = tk.Tk()
+  settings = {
+    'autofill date': tk.BooleanVar(value=False),
+    'autofill sheet data': tk.BooleanVar(value=False)
+  }
+  model = BenchmarkModel()
+
+  def build_form():
+    form = v.DataRecordForm(root, model, settings)
+    form.update_idletasks()
+    form.destroy()
+
+  def build_login():
+    dialog = v.LoginDialog(root)
+    root.after(1, dialog.cancel)
+    dialog.show('Login')
+    dialog.destroy()
+
+  for name, function in (
+    ('DataRecordForm', build_form), ('LoginDialog', build_login)
+  ):
+    first, mean = time_call(function, repeat)
+    print(f'{name:16} first: {first:8.2f} ms   mean: {mean:8.2f} ms')
+  root.destroy()
+
+
+if __name__ == '__main__':
+  main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,78 @@
+"""Compare opening and closing popups built each time against reused ones
+
+Run from the ABQ_Data_Entry directory::
+
+  python3 -m benchmarks.popup_latency [repeat]
+
+"Rebuilt" makes a new window each time and destroys it on close,
+as the application used to; "reused" shows and hides one window.
+"""
+import sys
+import tkinter as tk
+from time import perf_counter
+
+from abq_data_entry import views as v
+
+
+def growth_data(labs='ABCDE', days=90):
+  return [
+    {'Day': day, 'Avg Height (cm)': day * .1 + i, 'lab_id': lab}
+    for i, lab in enumerate(labs) for day in range(1, days + 1)
+  ]
+
+
+def mean_ms(function, repeat):
+  start = perf_counter()
+  for _ in range(repeat):
+    function()
+  return (perf_counter() - start) / repeat * 1000
+
+
+def main(repeat=20):
+  root = tk.Tk()
+  data = growth_data()
+
+  def build_chart(popup):
+    chart = v.LineChartView(
+      popup, data, (800, 400), 'Day', 'Avg Height (cm)', 'lab_id'
+    )
+    chart.pack()
+    return chart
+
+  def rebuilt_chart():
+    popup = tk.Toplevel(root)
+    build_chart(popup)
+    popup.update()
+    popup.destroy()
+
+  window = v.PopupWindow(root, 'Growth Chart')
+  chart = build_chart(window)
+
+  def reused_chart():
+    window.show()
+    chart.set_data(data)
+    window.update()
+    window.hide()
+
+  def login(dialog):
+    root.after(1, dialog.cancel)
+    dialog.show('Login')
+
+  def rebuilt_login():
+    dialog = v.LoginDialog(root)
+    login(dialog)
+    dialog.destroy()
+
+  dialog = v.LoginDialog(root)
+
+  for name, function in (
+    ('chart rebuilt', rebuilt_chart), ('chart reused', reused_chart),
+    ('login rebuilt', rebuilt_login),
+    ('login reused', lambda: login(dialog))
+  ):
+    print(f'{name:14} {mean_ms(function, repeat):8.2f} ms')
+  root.destroy()
+
+
+if __name__ == '__main__':
+  main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,34 @@
+"""Time ValidatedSpinbox keystroke validation
+
+Run from the ABQ_Data_Entry directory::
+
+  python3 -m benchmarks.spinbox_keystroke [repeat]
+
+This calls the key validation directly, as Tk does for each key
+typed, with a typical height entry.
+"""
+import sys
+import tkinter as tk
+from time import perf_counter
+
+from abq_data_entry import widgets as w
+
+
+def main(repeat=100000):
+  root = tk.Tk()
+  spinbox = w.ValidatedSpinbox(root, from_=0, to=1000, increment=.01)
+  keys = [('1', '', '1'), ('2', '1', '12'), ('.', '12', '12.'),
+    ('5', '12.', '12.5'), ('x', '12.5', '12.5x'), ('3', '12.5', '12.53')]
+
+  start = perf_counter()
+  for _ in range(repeat // len(keys)):
+    for char, current, proposed in keys:
+      spinbox._key_validate(char, 'end', current, proposed, '1')
+  elapsed = perf_counter() - start
+  count = repeat // len(keys) * len(keys)
+  print(f'{count} keystrokes: {elapsed / count * 1e6:.2f} us each')
+  root.destroy()
+
+
+if __name__ == '__main__':
+  main(*(int(arg) for arg in sys.argv[1:2]))
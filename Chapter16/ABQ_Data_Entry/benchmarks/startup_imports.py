@@ -0,0 +1,59 @@
+"""Measure how long importing the application takes
+
+Run from the ABQ_Data_Entry directory::
+
+  python3 -m benchmarks.startup_imports
+
+This runs ``python -X importtime`` on abq_data_entry.application
+and reports the total and the slowest top-level imports.  It exits
+with status 1 if any of the deferred dependencies were imported,
+so regressions can be caught.
+"""
+import subprocess
+import sys
+
+# these should only be imported on first use
+DEFERRED = ('matplotlib', 'numpy', 'psycopg2', 'requests', 'paramiko')
+TARGET = 'abq_data_entry.application'
+
+
+def import_times(module):
+  """Return a list of (cumulative us, module name, depth)"""
+  result = subprocess.run(
+    [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+    capture_output=True, text=True
+  )
+  if result.returncode:
+    sys.exit(f'import {module} failed:\n{result.stderr[-2000:]}')
+  times = list()
+  for line in result.stderr.splitlines():
+    if not line.startswith('import time:') or 'cumulative' in line:
+      continue
+    _, cumulative, name = line[len('import time:'):].split('|')
+    depth = (len(name) - len(name.lstrip())) // 2
+    times.append((int(cumulative), name.strip(), depth))
+  return times
+
+
+def main(top=10):
+  times = import_times(TARGET)
+  total = next(us for us, name, _ in times if name == TARGET)
+  print(f'import {TARGET}: {total / 1000:.1f} ms')
+  print('Slowest top-level imports:')
+  for us, name, _ in sorted(
+    (t for t in times if t[2] == 1), reverse=True
+  )[:top]:
+    print(f'  {us / 1000:8.1f} ms  {name}')
+
+  loaded = sorted({
+    name.split('.')[0] for _, name, _ in times
+    if name.split('.')[0] in DEFERRED
+  })
+  if loaded:
+    print('Imported at startup, but should be deferred:', ', '.join(loaded))
+    return 1
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
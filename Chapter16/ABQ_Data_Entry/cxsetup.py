@@ -2,6 +2,11 @@ import cx_Freeze as cx
 import platform
 import os
 
+from abq_data_entry.images.embed import write_module
+
+# build the images into the package so the frozen app needn't read them
+write_module()
+
 base = None
 target_name = 'abq'
 if platform.system() == "Windows":
@@ -0,0 +1,16 @@
+-- Search support for plot check notes and seed samples
+-- Safe to run against an existing database
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Keep a tsvector of the notes up to date automatically
+ALTER TABLE plot_checks ADD COLUMN IF NOT EXISTS notes_tsv tsvector
+    GENERATED ALWAYS AS
+    (to_tsvector('english', coalesce(notes, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS plot_checks_notes_tsv_idx
+    ON plot_checks USING GIN (notes_tsv);
+
+-- Trigram index for partial seed sample matches
+CREATE INDEX IF NOT EXISTS plot_checks_seed_sample_trgm_idx
+    ON plot_checks USING GIN ((seed_sample::text) gin_trgm_ops);
@@ -1,3 +1,6 @@
+-- Trigram matching, used to search seed samples
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- Lab techs
 -- Use employee ID # as primary key
 -- Since names can change
@@ -47,12 +50,20 @@ CREATE TABLE plot_checks(
 	    NOT NULL CHECK
 	    (median_height BETWEEN min_height AND max_height),
 	notes TEXT,
+	notes_tsv tsvector GENERATED ALWAYS AS
+	    (to_tsvector('english', coalesce(notes, ''))) STORED,
 	PRIMARY KEY(date, time, lab_id, plot),
 	FOREIGN KEY(lab_id, date, time)
 	    REFERENCES lab_checks(lab_id, date, time),
 	FOREIGN KEY(lab_id, plot) REFERENCES plots(lab_id, plot)
 	);
 
+-- Indexes for searching notes and seed samples
+CREATE INDEX plot_checks_notes_tsv_idx
+    ON plot_checks USING GIN (notes_tsv);
+CREATE INDEX plot_checks_seed_sample_trgm_idx
+    ON plot_checks USING GIN ((seed_sample::text) gin_trgm_ops);
+
 DROP VIEW IF EXISTS data_record_view;
 CREATE VIEW data_record_view AS (
     SELECT pc.date AS "Date",